@@ -0,0 +1,127 @@
+"""Command latency of the Flask `TGMessageDigester` and the aiohttp `AsyncMessageDigester`.
+
+Codeforces, Clist and cf_update are served by the stub server, and Firestore
+by an in-memory handle replica. `cold` is the first call of a command in a
+fresh process, after the commands before it in COMMANDS.
+
+    python -m benchmarks.commands
+"""
+import asyncio
+import contextlib
+import json
+import time
+import types
+from typing import Any
+
+from aiohttp import ClientSession, web
+
+from benchmarks.stub_server import CHAT_ID, StubServer, install_config
+from benchmarks.timing import atime_calls, summarize, time_calls
+
+GROUP_SIZE = 100
+USER_ID = 0  # a member with a handle
+
+COMMANDS = [
+    "/help",
+    "/tags",
+    "/select tags=dp|rating=1800-2200",
+    "/select",
+    "/stalk",
+    "/explode",
+    "/contests",
+    "/delta"
+]
+
+
+def update(i: int, text: str) -> dict[str, Any]:
+    return {
+        "update_id": i,
+        "message": {
+            "message_id": i,
+            "from": {"id": USER_ID, "is_bot": False, "first_name": "bench"},
+            "chat": {"id": CHAT_ID, "type": "supergroup"},
+            "date": int(time.time()),
+            "text": text
+        }
+    }
+
+
+def use_handles(stub: StubServer) -> None:
+    from tgbot import gcp_common
+    from tgbot.handle_replica import HandleReplica, InMemoryHandleBackend
+
+    replica = HandleReplica(InMemoryHandleBackend({str(i): h for i, h in enumerate(stub.members(GROUP_SIZE))}))
+    gcp_common.get_handle_replica = lambda: replica
+
+
+def flask_bot(stub: StubServer) -> types.ModuleType:
+    """`tgbot.bot` with its clients pointed at the stub server."""
+    from tgbot import bot
+    from tgbot.clist import ClistAPI
+    from tgbot.codeforces import CodeforcesAPI, ProblemsetSnapshot
+
+    bot.cf_client = CodeforcesAPI(ProblemsetSnapshot())
+    bot.cf_client.base_url = f"{stub.url}/api"
+    bot.clist_client = ClistAPI("stub")
+    bot.clist_client.base_url = f"{stub.url}/api/v2"
+    return bot
+
+
+async def webhook_app(stack: contextlib.AsyncExitStack, stub: StubServer) -> web.Application:
+    """The app of `tgbot.webhook`, set up as in its startup but against the stub server."""
+    from tgbot.clist import AsyncClistAPI
+    from tgbot.codeforces import AsyncCodeforcesAPI, CodeforcesAPI, ProblemsetSnapshot
+    from tgbot.leaderboard import Leaderboard
+    from tgbot.webhook import routes
+
+    app = web.Application()
+    app.add_routes(routes)
+    app["cf_client"] = await stack.enter_async_context(AsyncCodeforcesAPI())
+    app["cf_client"].base_url = f"{stub.url}/api"
+    app["clist_client"] = await stack.enter_async_context(AsyncClistAPI("stub"))
+    app["clist_client"].base_url = f"{stub.url}/api/v2"
+    app["session"] = await stack.enter_async_context(ClientSession())
+    app["leaderboard"] = Leaderboard()
+    app["problemset_client"] = CodeforcesAPI(ProblemsetSnapshot())
+    app["problemset_client"].base_url = f"{stub.url}/api"
+    return app
+
+
+def run_flask(stub: StubServer, repeat: int) -> dict[str, dict[str, float]]:
+    bot = flask_bot(stub)
+    results = {}
+    for text in COMMANDS:
+        digest = lambda: bot.TGMessageDigester(update(0, text)).response_output()
+        cold = time_calls(digest, 1)[0]
+        results[text] = {"cold_ms": cold * 1000, **summarize(time_calls(digest, repeat))}
+    return results
+
+
+async def run_aiohttp(stub: StubServer, repeat: int) -> dict[str, dict[str, float]]:
+    from tgbot.webhook import AsyncMessageDigester
+
+    async with contextlib.AsyncExitStack() as stack:
+        app = await webhook_app(stack, stub)
+        results = {}
+        for text in COMMANDS:
+            digest = lambda: AsyncMessageDigester(app, update(0, text)).digest()
+            cold = (await atime_calls(digest, 1))[0]
+            results[text] = {"cold_ms": cold * 1000, **summarize(await atime_calls(digest, repeat))}
+        return results
+
+
+def run(repeat: int = 50) -> dict[str, Any]:
+    with StubServer() as stub:
+        install_config(stub.url)
+        use_handles(stub)
+        results = {"aiohttp": asyncio.run(run_aiohttp(stub, repeat))}
+        try:
+            results["flask"] = run_flask(stub, repeat)
+        except ImportError as e:
+            results["flask"] = {"error": f"{type(e).__name__}: {e!s}"}
+        results["stub_requests"] = dict(stub.requests)
+        return results
+
+
+if __name__ == "__main__":
+    print(json.dumps(run(), indent=2))
@@ -0,0 +1,53 @@
+import timeit
+
+from benchmarks.fixtures import load
+from tgbot.codeforces.decoders import decode_contests, decode_rating_changes, decode_status
+from tgbot.codeforces.models import Contest, ContestPhase, Problem, RatingChange, Submission
+from tgbot.codeforces.snapshot import ProblemsetSnapshot
+
+
+def pydantic_problems(data):
+    problems = [Problem(**p) for p in data["problems"]]
+    return [p for p in problems if p.problemsetName is None]
+
+
+def compact_problems(data):
+    return ProblemsetSnapshot().apply(data["problems"], data["problemStatistics"])
+
+
+def pydantic_status(data):
+    status = [Submission(**s) for s in data]
+    return [s for s in status if s.author.not_team() and s.problem.problemsetName is None]
+
+
+def pydantic_contests(data):
+    contests = [Contest(**c) for c in data]
+    return [c for c in contests if c.phase in (ContestPhase.BEFORE, ContestPhase.CODING)]
+
+
+def pydantic_rating_changes(data):
+    return {rc.handle: rc for rc in (RatingChange(**rc) for rc in data)}
+
+
+CASES = [
+    ("problemset.problems", pydantic_problems, compact_problems),
+    ("user.status", pydantic_status, decode_status),
+    ("contest.list", pydantic_contests, lambda data: decode_contests(data, (ContestPhase.BEFORE, ContestPhase.CODING))),
+    ("contest.ratingChanges", pydantic_rating_changes, decode_rating_changes)
+]
+
+
+def run(number: int = 5) -> dict[str, dict[str, float]]:
+    results = {}
+    for name, baseline, compact in CASES:
+        data = load(name)
+        before = min(timeit.repeat(lambda: baseline(data), number=1, repeat=number))
+        after = min(timeit.repeat(lambda: compact(data), number=1, repeat=number))
+        results[name] = {"pydantic_s": before, "compact_s": after, "speedup": before / after}
+    return results
+
+
+if __name__ == "__main__":
+    for name, r in run().items():
+        print(f"{name:24} pydantic {r['pydantic_s'] * 1000:8.2f} ms   compact {r['compact_s'] * 1000:8.2f} ms   "
+              f"x{r['speedup']:.1f}")
@@ -0,0 +1,110 @@
+"""/delta in cf_update: the first reply, which builds the tables, and later replies from the built tables.
+
+The group's members take part in a 30000-participant contest that finished an
+hour ago and has no official rating changes yet, so the changes are predicted
+from the standings. Parsing a cf-predictor page for the same contest, the
+fallback, is timed as well.
+
+    python -m benchmarks.delta
+"""
+import asyncio
+import contextlib
+import json
+import os
+import tempfile
+import time
+from typing import Any
+
+from benchmarks.fixtures import load
+from benchmarks.stub_server import CHAT_ID, TOKEN, StubServer, install_config
+from benchmarks.timing import summarize, time_calls
+
+GROUP_SIZE = 100
+
+
+async def reply_time(app, stub: StubServer) -> float:
+    from tgbot import cf_update
+
+    sent = sum(m == "sendMessage" for m, _ in stub.telegram)
+    start = time.perf_counter()
+    await cf_update.send_delta(app, CHAT_ID)
+    while sum(m == "sendMessage" for m, _ in stub.telegram) == sent:
+        await asyncio.sleep(0.001)
+    return time.perf_counter() - start
+
+
+async def send_delta(stub: StubServer, repeat: int) -> dict[str, Any]:
+    from aiohttp import ClientSession, web
+    from telegram.constants import ParseMode
+    from telegram.ext import Application, Defaults
+
+    from tgbot import cf_update
+    from tgbot.cf_update.contest_mode import ContestWatcher
+    from tgbot.cf_update.delta_tables import DeltaTables
+    from tgbot.cf_update.rating_predictor import RatingPredictor
+    from tgbot.cf_update.scheduler import PollScheduler
+    from tgbot.cf_update.store import SubmissionStore
+    from tgbot.cf_update.sync import SyncState
+    from tgbot.codeforces import AsyncCodeforcesAPI
+
+    async with contextlib.AsyncExitStack() as stack:
+        # As in tgbot.cf_update.startup, without the rate limiter
+        app = web.Application()
+        app["cf_client"] = await stack.enter_async_context(AsyncCodeforcesAPI())
+        app["cf_client"].base_url = f"{stub.url}/api"
+        app["session"] = await stack.enter_async_context(ClientSession(raise_for_status=True))
+        tmp = stack.enter_context(tempfile.TemporaryDirectory())
+        app["store"] = await stack.enter_async_context(
+            SubmissionStore(os.path.join(tmp, "cf_update.sqlite3"), tinydb_path=None)
+        )
+        for handle in stub.members(GROUP_SIZE):
+            await app["store"].add_handle(handle, SyncState())
+        app["predictor"] = RatingPredictor(app["cf_client"])
+        app["contest_watcher"] = ContestWatcher(app["cf_client"], PollScheduler())
+        app["delta_tables"] = DeltaTables(cf_update.DELTA_REFRESH_INTERVAL)
+        application = (
+            Application.builder()
+            .token(TOKEN)
+            .base_url(f"{stub.url}/bot")
+            .defaults(Defaults(parse_mode=ParseMode.HTML, disable_web_page_preview=True))
+            .build()
+        )
+        app["bot"] = await stack.enter_async_context(application.bot)
+
+        cold = await reply_time(app, stub)
+        warm = [await reply_time(app, stub) for _ in range(repeat)]
+
+        start = time.perf_counter()
+        await app["delta_tables"].refresh(app, cf_update.get_handles(app))
+        return {
+            "cold_ms": cold * 1000,
+            "warm": summarize(warm),
+            "idle_refresh_ms": (time.perf_counter() - start) * 1000  # a background tick with nothing stale
+        }
+
+
+def parse_predictor_page(repeat: int) -> dict[str, Any]:
+    from tgbot.cf_update.predicted_deltas import Parser
+
+    page = load("cf-predictor")
+    # Members at the bottom of the table, so the parser cannot stop early
+    handles = {rc["handle"] for rc in load("contest.ratingChanges")[-GROUP_SIZE:]}
+
+    def parse() -> None:
+        parser = Parser(handles)
+        parser.feed(page)
+
+    return {"bytes": len(page.encode()), **summarize(time_calls(parse, repeat))}
+
+
+def run(repeat: int = 20) -> dict[str, Any]:
+    with StubServer() as stub:
+        install_config(stub.url)
+        return {
+            "send_delta": asyncio.run(send_delta(stub, repeat)),
+            "cf_predictor_parse": parse_predictor_page(5)
+        }
+
+
+if __name__ == "__main__":
+    print(json.dumps(run(), indent=2))
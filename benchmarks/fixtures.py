@@ -0,0 +1,192 @@
+import json
+import os
+import random
+import string
+from datetime import datetime, timedelta
+from typing import Any
+
+from tgbot.utils import RESOURCES
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+TAGS = [
+    "implementation", "math", "greedy", "dp", "data structures", "brute force", "constructive algorithms",
+    "graphs", "sortings", "binary search", "dfs and similar", "trees", "strings", "number theory",
+    "combinatorics", "*special", "two pointers", "bitmasks", "geometry", "dsu", "shortest paths",
+    "probabilities", "divide and conquer", "hashing", "games", "flows", "interactive", "matrices", "fft"
+]
+VERDICTS = ["OK"] * 5 + ["WRONG_ANSWER"] * 3 + ["TIME_LIMIT_EXCEEDED", "RUNTIME_ERROR", "COMPILATION_ERROR"]
+LANGUAGES = ["GNU C++17", "GNU C++20 (64)", "Python 3", "PyPy 3-64", "Java 21"]
+
+
+def _handle(rng: random.Random) -> str:
+    return "".join(rng.choices(string.ascii_letters + string.digits + "_", k=rng.randint(4, 14)))
+
+
+def _problem(rng: random.Random, contest_id: int, index: str) -> dict[str, Any]:
+    problem = {
+        "contestId": contest_id,
+        "index": index,
+        "name": " ".join(rng.choice(string.ascii_uppercase) + "".join(rng.choices(string.ascii_lowercase, k=6))
+                         for _ in range(rng.randint(1, 4))),
+        "type": "PROGRAMMING",
+        "tags": rng.sample(TAGS, rng.randint(0, 4))
+    }
+    if rng.random() < 0.9:
+        problem["rating"] = rng.randrange(800, 3600, 100)
+    if rng.random() < 0.3:
+        problem["points"] = rng.randrange(500, 3500, 250)
+    return problem
+
+
+def problemset_problems(n: int = 9500, seed: int = 0) -> dict[str, Any]:
+    rng = random.Random(seed)
+    problems, statistics = [], []
+    contest_id = 2000
+    while len(problems) < n:
+        for index in "ABCDEF"[:rng.randint(3, 6)]:
+            problems.append(_problem(rng, contest_id, index))
+            statistics.append({"contestId": contest_id, "index": index, "solvedCount": rng.randint(0, 60000)})
+        contest_id -= 1
+    return {"problems": problems[:n], "problemStatistics": statistics[:n]}
+
+
+def user_status(handle: str = "tourist", n: int = 100, seed: int = 0) -> list[dict[str, Any]]:
+    rng = random.Random(seed)
+    submissions = []
+    sid = 250000000
+    t = 1700000000
+    for _ in range(n):
+        contest_id = rng.randint(1000, 2000)
+        index = rng.choice("ABCDEF")
+        verdict = rng.choice(VERDICTS)
+        team = rng.random() < 0.05
+        author = {
+            "contestId": contest_id,
+            "members": [{"handle": handle}] + ([{"handle": _handle(rng)}] if team else []),
+            "participantType": rng.choice(["CONTESTANT", "PRACTICE", "PRACTICE", "VIRTUAL"]),
+            "ghost": False,
+            "startTimeSeconds": t - 7200
+        }
+        if team:
+            author.update(teamId=rng.randint(1, 10 ** 5), teamName=_handle(rng))
+        submissions.append({
+            "id": sid,
+            "contestId": contest_id,
+            "creationTimeSeconds": t,
+            "relativeTimeSeconds": 2147483647,
+            "problem": _problem(rng, contest_id, index),
+            "author": author,
+            "programmingLanguage": rng.choice(LANGUAGES),
+            "verdict": verdict,
+            "testset": "TESTS",
+            "passedTestCount": rng.randint(0, 80),
+            "timeConsumedMillis": rng.randint(15, 2000),
+            "memoryConsumedBytes": rng.randint(0, 256) * 1024 * 1024
+        })
+        sid -= rng.randint(1, 10 ** 5)
+        t -= rng.randint(60, 10 ** 5)
+    return submissions
+
+
+def contest_list(n: int = 1900, seed: int = 0) -> list[dict[str, Any]]:
+    rng = random.Random(seed)
+    contests = []
+    t = 1760000000
+    for i in range(n):
+        phase = "BEFORE" if i < 8 else "FINISHED"
+        contests.append({
+            "id": 2100 - i,
+            "name": f"Codeforces Round {1000 - i} (Div. {rng.randint(1, 4)})",
+            "type": rng.choice(["CF", "ICPC"]),
+            "phase": phase,
+            "frozen": False,
+            "durationSeconds": rng.choice([7200, 8100, 9000]),
+            "startTimeSeconds": t,
+            "relativeTimeSeconds": -1
+        })
+        t -= rng.randint(86400, 5 * 86400)
+    return contests
+
+
+def rating_changes(n: int = 30000, contest_id: int = 2000, seed: int = 0) -> list[dict[str, Any]]:
+    rng = random.Random(seed)
+    changes = []
+    for rank in range(1, n + 1):
+        old = rng.randint(0, 3800)
+        changes.append({
+            "contestId": contest_id,
+            "contestName": "Codeforces Round 1000 (Div. 2)",
+            "handle": _handle(rng) + str(rank),
+            "rank": rank,
+            "ratingUpdateTimeSeconds": 1760000000,
+            "oldRating": old,
+            "newRating": old + rng.randint(-150, 150)
+        })
+    return changes
+
+
+def user_info(handle: str) -> dict[str, Any]:
+    rng = random.Random(handle)
+    user = {"handle": handle, "contribution": 0, "friendOfCount": rng.randint(0, 100)}
+    if rng.random() < 0.8:
+        rating = rng.randint(800, 3000)
+        user.update(rating=rating, maxRating=rating + rng.randint(0, 300), rank="expert", maxRank="candidate master")
+    return user
+
+
+def clist_contests(n: int = 40, seed: int = 0) -> list[dict[str, Any]]:
+    rng = random.Random(seed)
+    contests = []
+    start = datetime(2025, 10, 1, 14, 35)
+    for i in range(n):
+        resource = rng.choice(list(RESOURCES))
+        duration = timedelta(minutes=rng.choice([90, 120, 150, 180, 300]))
+        contests.append({
+            "id": 50000000 + i,
+            "event": f"{RESOURCES[resource]} Contest {i + 1}",
+            "href": f"https://{resource}/contests/{i + 1}",
+            "resource": resource,
+            "start": start.strftime("%Y-%m-%dT%H:%M:%S"),
+            "end": (start + duration).strftime("%Y-%m-%dT%H:%M:%S"),
+            "duration": int(duration.total_seconds())
+        })
+        start += timedelta(hours=rng.randint(2, 30))
+    return contests
+
+
+def predictor_page(n: int = 30000, contest_id: int = 2000, seed: int = 0) -> str:
+    """cf-predictor's roundResults.jsp for the participants of `rating_changes`."""
+    rows = "".join(
+        f"<tr><td>{rc['rank']}</td><td>{rc['handle']}</td><td>{rc['newRating'] - rc['oldRating']}</td>"
+        f"<td>{rc['oldRating']}</td></tr>\n"
+        for rc in rating_changes(n, contest_id, seed)
+    )
+    return (
+        f"<html><head><title>Round {contest_id}</title></head><body><table>"
+        f"<thead><tr><th>#</th><th>Handle</th><th>Delta</th><th>Rating</th></tr></thead>"
+        f"<tbody>\n{rows}</tbody></table></body></html>"
+    )
+
+
+GENERATORS = {
+    "problemset.problems": problemset_problems,
+    "user.status": user_status,
+    "contest.list": contest_list,
+    "contest.ratingChanges": rating_changes,
+    "clist.contest": clist_contests,
+    "cf-predictor": predictor_page
+}
+
+
+def load(name: str) -> Any:
+    """Load a recorded fixture from benchmarks/fixtures/<name>.json (or .html), or synthesize one."""
+    path = os.path.join(FIXTURES_DIR, f"{name}.json")
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    path = os.path.join(FIXTURES_DIR, f"{name}.html")
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+    return GENERATORS[name]()
@@ -0,0 +1,62 @@
+import json
+import timeit
+import tracemalloc
+from typing import Any, Callable
+
+import orjson
+import ujson
+
+from benchmarks.fixtures import load
+
+ENDPOINTS = ["problemset.problems", "contest.ratingChanges"]
+
+
+def payload(name: str) -> bytes:
+    """Response body of an endpoint as sent by Codeforces."""
+    return json.dumps({"status": "OK", "result": load(name)}).encode()
+
+
+def text_then_json(body: bytes) -> Any:
+    # What the clients did: resp.text() for the error checks, then resp.json() decoding the body again
+    text = body.decode("utf-8")
+    if "Codeforces is temporarily unavailable." in text or "504 Gateway Time-out" in text:
+        raise RuntimeError
+    return json.loads(body.decode("utf-8"))
+
+
+def decoders() -> dict[str, Callable[[bytes], Any]]:
+    # Any of these can be passed to the clients as json_loads
+    return {"text + json": text_then_json, "ujson": ujson.loads, "orjson": orjson.loads}
+
+
+def peak_memory(func: Callable[[bytes], Any], body: bytes) -> int:
+    tracemalloc.start()
+    func(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def run(number: int = 5) -> dict[str, dict[str, dict[str, float]]]:
+    results = {}
+    for name in ENDPOINTS:
+        body = payload(name)
+        expected = text_then_json(body)
+        results[name] = {}
+        for path, func in decoders().items():
+            assert func(body) == expected
+            results[name][path] = {
+                "bytes": len(body),
+                "seconds": min(timeit.repeat(lambda: func(body), number=1, repeat=number)),
+                "peak_bytes": peak_memory(func, body)
+            }
+    return results
+
+
+if __name__ == "__main__":
+    for name, paths in run().items():
+        baseline = paths["text + json"]["seconds"]
+        print(f"{name} ({paths['text + json']['bytes'] / 1e6:.1f} MB)")
+        for path, r in paths.items():
+            print(f"  {path:12} {r['seconds'] * 1000:8.2f} ms   x{baseline / r['seconds']:.2f}   "
+                  f"peak {r['peak_bytes'] / 1e6:6.1f} MB")
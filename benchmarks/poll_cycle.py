@@ -0,0 +1,94 @@
+"""One polling cycle of cf_update at 10, 100 and 1000 handles.
+
+A cycle is one iteration of `update_status_forever`: refresh the users, then
+let the poll workers go through every handle once. Every tenth member has a
+new accepted submission to announce. Codeforces and Telegram are served by
+the stub server without a rate limit, so this measures our own overhead.
+
+    python -m benchmarks.poll_cycle
+"""
+import asyncio
+import contextlib
+import json
+import os
+import tempfile
+import time
+from typing import Any
+
+from benchmarks.stub_server import TOKEN, StubServer, install_config
+
+SIZES = (10, 100, 1000)
+
+
+async def cycle(stub: StubServer, n: int) -> dict[str, Any]:
+    from aiohttp import web
+    from telegram.constants import ParseMode
+    from telegram.ext import Application, Defaults
+
+    from tgbot import cf_update
+    from tgbot.cf_update.outbox import Outbox
+    from tgbot.cf_update.scheduler import PollScheduler
+    from tgbot.cf_update.store import SubmissionStore
+    from tgbot.codeforces import AsyncCodeforcesAPI
+
+    handles = [f"member{n}_{i}" for i in range(n)]
+    async with contextlib.AsyncExitStack() as stack:
+        # As in tgbot.cf_update.startup, without the rate limiter
+        app = web.Application()
+        app["cf_client"] = await stack.enter_async_context(AsyncCodeforcesAPI())
+        app["cf_client"].base_url = f"{stub.url}/api"
+        tmp = stack.enter_context(tempfile.TemporaryDirectory())
+        app["store"] = await stack.enter_async_context(
+            SubmissionStore(os.path.join(tmp, "cf_update.sqlite3"), tinydb_path=None)
+        )
+        app["users"] = {}
+        app["scheduler"] = PollScheduler(
+            cf_update.POLL_MIN_INTERVAL, cf_update.POLL_MAX_INTERVAL, cf_update.POLL_BACKOFF,
+            cf_update.POLL_COVERED_INTERVAL
+        )
+        application = (
+            Application.builder()
+            .token(TOKEN)
+            .base_url(f"{stub.url}/bot")
+            .defaults(Defaults(parse_mode=ParseMode.HTML, disable_web_page_preview=True))
+            .build()
+        )
+        app["bot"] = await stack.enter_async_context(application.bot)
+        app["outbox"] = await stack.enter_async_context(Outbox(app["bot"]))
+
+        start = time.perf_counter()
+        await asyncio.gather(*[cf_update.init_user(app, h) for h in handles])
+        init_s = time.perf_counter() - start
+        for handle in handles[::10]:
+            stub.submit(handle)
+
+        requests = sum(stub.requests.values())
+        sent = len(stub.telegram)
+        start = time.perf_counter()
+        app["scheduler"].sync(cf_update.get_handles(app))
+        app["users"] = await cf_update.get_users(app, handles)
+        workers = [asyncio.create_task(cf_update.poll_worker(app)) for _ in range(cf_update.POLL_CONCURRENCY)]
+        while len(app["scheduler"].last_polled) < n:
+            await asyncio.sleep(0.001)
+        cycle_s = time.perf_counter() - start
+        for worker in workers:
+            worker.cancel()
+
+        return {
+            "init_s": init_s,
+            "cycle_s": cycle_s,
+            "per_handle_ms": cycle_s / n * 1000,
+            "requests": sum(stub.requests.values()) - requests,
+            "telegram_messages": sum(m == "sendMessage" for m, _ in stub.telegram[sent:]),
+            "queued_announcements": app["outbox"].queued()  # still held back by the outbox rate limit
+        }
+
+
+def run(sizes: tuple[int, ...] = SIZES) -> dict[str, dict[str, Any]]:
+    with StubServer() as stub:
+        install_config(stub.url)
+        return {str(n): asyncio.run(cycle(stub, n)) for n in sizes}
+
+
+if __name__ == "__main__":
+    print(json.dumps(run(), indent=2))
@@ -0,0 +1,38 @@
+"""/select: building the problem index from problemset.problems, then picking problems from it.
+
+    python -m benchmarks.problem_select
+"""
+import time
+
+from benchmarks.stub_server import StubServer
+from benchmarks.timing import summarize, time_calls
+from tgbot.codeforces import CodeforcesAPI, ProblemsetSnapshot
+
+QUERIES = {
+    "any": (set(), None),
+    "rating": (set(), [1800, 2200]),
+    "tag": ({"dp"}, None),
+    "tags_rating": ({"graphs", "trees"}, [2000, 2600]),
+    "sign_on": (set(), [3000, 3500]),
+    "no_match": ({"fft", "games", "flows"}, [800, 900])
+}
+
+
+def run(repeat: int = 2000) -> dict[str, dict[str, float]]:
+    with StubServer() as stub:
+        cf_client = CodeforcesAPI(ProblemsetSnapshot())
+        cf_client.base_url = f"{stub.url}/api"
+
+        # Download, snapshot diff and index build, as on the first /select of a fresh instance
+        start = time.perf_counter()
+        index = cf_client.get_problem_index()
+        results = {"cold": {"seconds": time.perf_counter() - start, "problems": len(index.problems)}}
+
+        for name, (tags, rating) in QUERIES.items():
+            results[name] = summarize(time_calls(lambda: cf_client.get_problem_index().select(tags, rating), repeat))
+        return results
+
+
+if __name__ == "__main__":
+    for name, r in run().items():
+        print(f"{name:12} {r}")
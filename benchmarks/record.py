@@ -0,0 +1,70 @@
+"""Record real payloads into benchmarks/fixtures, to be used instead of the synthesized ones.
+
+    python -m benchmarks.record --contest-id 2000 --handle tourist --clist-api-key <key>
+
+Only fixtures with the needed arguments are recorded; the others stay synthesized.
+"""
+import argparse
+import json
+import os
+from typing import Any, Optional
+
+import requests
+
+from benchmarks.fixtures import FIXTURES_DIR
+from tgbot.utils import RESOURCES
+
+
+def codeforces(session: requests.Session, endpoint: str, **params) -> Any:
+    resp = session.get(f"https://codeforces.com/api/{endpoint}", params=params, timeout=60)
+    resp.raise_for_status()
+    return resp.json()["result"]
+
+
+def save(name: str, data: Any) -> None:
+    if isinstance(data, str):
+        path = os.path.join(FIXTURES_DIR, f"{name}.html")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(data)
+    else:
+        path = os.path.join(FIXTURES_DIR, f"{name}.json")
+        with open(path, "w") as f:
+            json.dump(data, f)
+    print(f"{path}: {os.path.getsize(path) / 1e6:.1f} MB")
+
+
+def record(contest_id: Optional[int] = None, handle: Optional[str] = None, clist_api_key: Optional[str] = None) -> None:
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    session = requests.Session()
+
+    save("problemset.problems", codeforces(session, "problemset.problems"))
+    save("contest.list", codeforces(session, "contest.list", gym="false"))
+    if handle:
+        save("user.status", codeforces(session, "user.status", handle=handle, count=100))
+    if contest_id:
+        save("contest.ratingChanges", codeforces(session, "contest.ratingChanges", contestId=contest_id))
+        resp = session.get(
+            "https://cf-predictor-frontend.herokuapp.com/roundResults.jsp",
+            params={"contestId": contest_id},
+            timeout=60
+        )
+        resp.raise_for_status()
+        save("cf-predictor", resp.text)
+    if clist_api_key:
+        resp = session.get(
+            "https://clist.by/api/v2/contest",
+            params={"upcoming": "true", "resource": ",".join(RESOURCES)},
+            headers={"Authorization": f"ApiKey {clist_api_key}"},
+            timeout=60
+        )
+        resp.raise_for_status()
+        save("clist.contest", resp.json()["objects"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--contest-id", type=int, help="a finished rated contest, for rating changes and cf-predictor")
+    parser.add_argument("--handle", help="a handle with at least 100 submissions, for user.status")
+    parser.add_argument("--clist-api-key")
+    args = parser.parse_args()
+    record(args.contest_id, args.handle, args.clist_api_key)
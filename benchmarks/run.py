@@ -0,0 +1,117 @@
+"""Run the offline benchmarks and write the results as JSON.
+
+Nothing is sent to Codeforces, Clist or Telegram: the benchmarks use the
+fixtures in benchmarks/fixtures (see `benchmarks.record`) or synthesized ones,
+served by `benchmarks.stub_server`.
+
+    python -m benchmarks.run --output before.json
+    python -m benchmarks.run --output after.json --baseline before.json
+
+With --baseline, timings that got more than 10% slower are listed.
+"""
+import argparse
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import traceback
+from datetime import datetime, timezone
+from typing import Any, Iterator
+
+from benchmarks.fixtures import FIXTURES_DIR, GENERATORS
+
+SUITES = [
+    "decoders",  # model parsing
+    "json_decode",
+    "problem_select",
+    "commands",
+    "webhook_load",
+    "poll_cycle",
+    "delta",
+    "state_size",
+    "startup"
+]
+THRESHOLD = 1.1
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def recorded_fixtures() -> list[str]:
+    return [
+        name for name in GENERATORS
+        if any(os.path.exists(os.path.join(FIXTURES_DIR, f"{name}.{ext}")) for ext in ("json", "html"))
+    ]
+
+
+def run(suites: list[str]) -> dict[str, Any]:
+    results = {}
+    for name in suites:
+        print(f"{name}...", file=sys.stderr)
+        start = time.perf_counter()
+        try:
+            results[name] = importlib.import_module(f"benchmarks.{name}").run()
+        except Exception as e:
+            # e.g. the Flask bot without Flask installed; the other suites still run
+            traceback.print_exc()
+            results[name] = {"error": f"{type(e).__name__}: {e!s}"}
+        print(f"{name}: {time.perf_counter() - start:.1f} s", file=sys.stderr)
+
+    return {
+        "meta": {
+            "time": datetime.now(timezone.utc).isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "recorded_fixtures": recorded_fixtures()
+        },
+        "results": results
+    }
+
+
+def timings(results: Any, path: str = "") -> Iterator[tuple[str, float]]:
+    """Timings in the results, keyed by their path. Lower is better for all of them. Maxima are too noisy to compare."""
+    if isinstance(results, dict):
+        for key, value in results.items():
+            yield from timings(value, f"{path}/{key}" if path else str(key))
+    elif isinstance(results, (int, float)) and path.endswith(("_s", "_ms", "seconds")) and not path.endswith("max_ms"):
+        yield path, results
+
+
+def compare(baseline: dict[str, Any], current: dict[str, Any]) -> list[tuple[str, float, float]]:
+    before = dict(timings(baseline["results"]))
+    return [
+        (path, before[path], after)
+        for path, after in timings(current["results"])
+        if before.get(path) and after / before[path] > THRESHOLD
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("suites", nargs="*", help=f"any of {', '.join(SUITES)} (default: all)")
+    parser.add_argument("--output", default="benchmarks/results.json")
+    parser.add_argument("--baseline", help="results of an earlier run to compare with")
+    args = parser.parse_args()
+    if unknown := set(args.suites) - set(SUITES):
+        parser.error(f"unknown suites: {', '.join(sorted(unknown))}")
+
+    results = run(args.suites or SUITES)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        slower = compare(baseline, results)
+        for path, before, after in slower:
+            print(f"{path:60} {before:12.3f} -> {after:12.3f}   x{after / before:.2f}")
+        print(f"{len(slower)} timings more than {THRESHOLD - 1:.0%} slower than {args.baseline}")
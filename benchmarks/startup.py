@@ -0,0 +1,127 @@
+"""Cold start of the webhook: import time plus time to the first /help reply.
+
+GCP services are replaced by local fakes that sleep for a fixed time where
+the real libraries do network or heavy import work. Each mode runs in a fresh
+interpreter. `eager` initializes every client before serving, like
+gcp_common used to do at import time; `lazy` is the current behaviour.
+
+    python -m benchmarks.startup
+"""
+import asyncio
+import json
+import subprocess
+import sys
+import time
+import types
+
+# Seconds spent by each fake, roughly what the real ones take on a cold App Engine instance
+COSTS = {
+    "metadata": 0.05,
+    "logging": 0.3,
+    "debugger": 0.2,
+    "firestore": 0.4,
+    "tasks": 0.3
+}
+
+
+class FakeResponse:
+    status_code = 200
+    text = "fake-project"
+
+
+class FakeSession:
+    def get(self, url, **kwargs):
+        if "metadata" in url:
+            time.sleep(COSTS["metadata"])
+        return FakeResponse()
+
+    def post(self, url, **kwargs):
+        return FakeResponse()
+
+
+class FakeCollection:
+    def on_snapshot(self, callback):
+        callback([], [], None)
+
+    def stream(self):
+        return []
+
+
+def install_fakes() -> None:
+    def module(name, **attrs):
+        m = types.ModuleType(name)
+        m.__dict__.update(attrs)
+        sys.modules[name] = m
+        return m
+
+    def client(cost, **methods):
+        def __init__(self, *args, **kwargs):
+            time.sleep(cost)
+        return type("Client", (), {"__init__": __init__, **methods})
+
+    google = module("google")
+    google.cloud = module("google.cloud")
+    google.cloud.logging = module("google.cloud.logging", Client=client(COSTS["logging"], setup_logging=lambda self: None))
+    google.cloud.firestore = module("google.cloud.firestore", Client=client(
+        COSTS["firestore"], collection=lambda self, name: FakeCollection()
+    ))
+    google.cloud.tasks_v2 = module("google.cloud.tasks_v2", CloudTasksClient=client(
+        COSTS["tasks"], queue_path=lambda self, *args: "/".join(args), create_task=lambda self, **kwargs: None
+    ))
+    module("googleclouddebugger", enable=lambda **kwargs: time.sleep(COSTS["debugger"]))
+    module("tgbot.config", config={
+        "TOKEN": "", "SECRET": "", "CLIST_API_KEY": "", "FUNCTIONS_URL": "", "CF_UPDATE_URL": "", "CHAT_ID": -1
+    })
+
+
+async def first_reply(create_app) -> None:
+    from aiohttp.test_utils import TestClient, TestServer
+
+    async with TestClient(TestServer(await create_app())) as client:
+        resp = await client.post("/", json={
+            "update_id": 1,
+            "message": {
+                "message_id": 1,
+                "from": {"id": 1, "is_bot": False, "first_name": "a"},
+                "chat": {"id": 1, "type": "private"},
+                "text": "/help"
+            }
+        })
+        assert (await resp.json())["method"] == "sendMessage"
+
+
+def child(mode: str) -> dict[str, float]:
+    install_fakes()
+    start = time.perf_counter()
+    from tgbot import gcp_common
+
+    gcp_common.session = FakeSession()
+    if mode == "eager":
+        gcp_common.setup_cloud_logging()
+        gcp_common.enable_debugger()
+        gcp_common.get_db()
+        gcp_common.get_task_parent()
+    from tgbot.webhook import create_app
+    imported = time.perf_counter()
+
+    asyncio.run(first_reply(create_app))
+    return {"import_s": imported - start, "first_reply_s": time.perf_counter() - start}
+
+
+def run() -> dict[str, dict[str, float]]:
+    results = {}
+    for mode in ("eager", "lazy"):
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.startup", "--child", mode],
+            check=True, capture_output=True, text=True
+        ).stdout
+        results[mode] = json.loads(out.splitlines()[-1])
+    return results
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--child":
+        print(json.dumps(child(sys.argv[2])))
+    else:
+        for mode, r in run().items():
+            print(f"{mode:6} import {r['import_s'] * 1000:8.1f} ms   first reply {r['first_reply_s'] * 1000:8.1f} ms")
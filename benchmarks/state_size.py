@@ -0,0 +1,56 @@
+import asyncio
+import json
+import os
+import tempfile
+import tracemalloc
+
+from benchmarks.fixtures import user_status
+from tgbot.cf_update.store import SubmissionStore
+from tgbot.cf_update.sync import Fingerprint, SyncState
+from tgbot.codeforces.models import Submission
+
+
+def measure(build):
+    tracemalloc.start()
+    obj = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return obj, size
+
+
+async def store_size(states: dict[str, SyncState]) -> int:
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "state.sqlite3")
+        async with SubmissionStore(path, tinydb_path=None) as store:
+            for handle, state in states.items():
+                await store.add_handle(handle, state)
+        return os.path.getsize(path)
+
+
+def run(handles: int = 100) -> dict[str, dict[str, int]]:
+    payloads = {f"user{i}": user_status(f"user{i}", seed=i) for i in range(handles)}
+    results = {}
+
+    # Before: 100 full submission dicts per handle, re-validated into pydantic models every cycle
+    docs, memory = measure(lambda: {h: [Submission(**s).dict() for s in p] for h, p in payloads.items()})
+    _, parsed_memory = measure(lambda: [[Submission(**s) for s in doc] for doc in docs.values()])
+    tinydb_json = json.dumps({"_default": {str(i): {"handle": h, "status": d} for i, (h, d) in enumerate(docs.items())}},
+                             default=str)
+    results["full_dicts"] = {"memory": memory + parsed_memory, "disk": len(tinydb_json.encode())}
+
+    # Fingerprints of the same 100 submissions per handle
+    fingerprints, memory = measure(
+        lambda: {h: SyncState(0, {s["id"]: Fingerprint.of(s) for s in p}) for h, p in payloads.items()}
+    )
+    results["fingerprints"] = {"memory": memory, "disk": asyncio.run(store_size(fingerprints))}
+
+    # What is actually kept: the watermark plus fingerprints of non-final submissions
+    finished = {s.get("contestId") for p in payloads.values() for s in p}
+    states, memory = measure(lambda: {h: SyncState.from_submissions(p, finished) for h, p in payloads.items()})
+    results["watermark"] = {"memory": memory, "disk": asyncio.run(store_size(states))}
+    return results
+
+
+if __name__ == "__main__":
+    for name, r in run().items():
+        print(f"{name:14} memory {r['memory'] / 1024:9.1f} KiB   disk {r['disk'] / 1024:9.1f} KiB")
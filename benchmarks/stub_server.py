@@ -0,0 +1,196 @@
+"""Local stand-in for Codeforces, cf-predictor, Clist, the Telegram Bot API and cf_update.
+
+Codeforces answers from the fixtures in `benchmarks.fixtures`. One finished
+contest is moved to an hour ago, so /delta has a contest to predict; its
+standings are made of the participants of the contest.ratingChanges fixture.
+Requests are counted per path in `requests`, and every Telegram call is kept
+in `telegram`.
+
+The server runs its own event loop in a background thread, so that it serves
+blocking clients too and its work is not timed as part of the benchmarks.
+"""
+import asyncio
+import json
+import sys
+import threading
+import time
+import types
+import zlib
+from collections import Counter
+from typing import Any, Optional
+
+from aiohttp import web
+
+from benchmarks.fixtures import load, user_info, user_status
+
+TOKEN = "123456:stub"  # in the format checked by python-telegram-bot
+CHAT_ID = -1
+
+
+def install_config(url: str = "") -> dict[str, Any]:
+    """Point the config at the stub server, in place of tgbot/config.json if it is not loaded yet."""
+    if "tgbot.config" not in sys.modules:
+        module = types.ModuleType("tgbot.config")
+        module.config = {}
+        sys.modules["tgbot.config"] = module
+    config = sys.modules["tgbot.config"].config
+    config.update(
+        TOKEN=TOKEN, SECRET="stub", CLIST_API_KEY="stub", FUNCTIONS_URL=url, CF_UPDATE_URL=url, CHAT_ID=CHAT_ID
+    )
+    return config
+
+
+class StubServer:
+    def __init__(self, latency: float = 0):
+        self.latency = latency  # added to every response
+        self.url = ""
+        self.requests: Counter[str] = Counter()
+        self.telegram: list[tuple[str, dict[str, Any]]] = []
+        self.runner: Optional[web.AppRunner] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread: Optional[threading.Thread] = None
+        self.bodies: dict[str, bytes] = {}  # serialized once
+
+        self.problems = load("problemset.problems")
+        self.contests = load("contest.list")
+        self.rating_changes = load("contest.ratingChanges")
+        self.clist_contests = load("clist.contest")
+        self.predictor_page = load("cf-predictor")
+        self.statuses: dict[str, list[dict[str, Any]]] = {}
+
+        # The contest of the rating changes fixture, finished an hour ago and not yet rated
+        self.contest_id = self.rating_changes[0]["contestId"]
+        finished = next(c for c in self.contests if c["phase"] == "FINISHED")
+        self.contest = dict(finished, id=self.contest_id, name=self.rating_changes[0]["contestName"])
+        self.contest["startTimeSeconds"] = int(time.time()) - self.contest["durationSeconds"] - 60 * 60
+        self.contests = [self.contest] + [c for c in self.contests if c["id"] != self.contest_id]
+        self.standings = [
+            {
+                "party": {"members": [{"handle": rc["handle"]}], "participantType": "CONTESTANT", "ghost": False},
+                "rank": rc["rank"],
+                "points": float(len(self.rating_changes) - rc["rank"]),
+                "penalty": 0,
+                "successfulHackCount": 0,
+                "unsuccessfulHackCount": 0,
+                "problemResults": []
+            }
+            for rc in self.rating_changes
+        ]
+        self.rated_list = [{"handle": rc["handle"], "rating": rc["oldRating"]} for rc in self.rating_changes]
+
+    def members(self, n: int) -> list[str]:
+        """Handles of `n` participants of the contest."""
+        return [rc["handle"] for rc in self.rating_changes[:n]]
+
+    def __enter__(self) -> "StubServer":
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self.start(), self.loop).result()
+        return self
+
+    def __exit__(self, *args) -> None:
+        asyncio.run_coroutine_threadsafe(self.runner.cleanup(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    async def start(self) -> None:
+        app = web.Application(middlewares=[self.count])
+        app.add_routes([
+            web.get("/api/v2/contest", self.clist),
+            web.get("/api/{endpoint}", self.codeforces),
+            web.get("/roundResults.jsp", self.predictor),
+            web.post("/bot{token}/{method}", self.bot_api),
+            web.post("/delta", self.cf_update)
+        ])
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}"
+
+    @web.middleware
+    async def count(self, request: web.Request, handler) -> web.StreamResponse:
+        self.requests[request.path] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return await handler(request)
+
+    def status(self, handle: str) -> list[dict[str, Any]]:
+        if handle not in self.statuses:
+            self.statuses[handle] = user_status(handle, seed=zlib.crc32(handle.encode()))
+        return self.statuses[handle]
+
+    def submit(self, handle: str) -> None:
+        """Add an accepted submission of `handle` in the contest, as if it was just judged."""
+        status = self.status(handle)
+        submission = json.loads(json.dumps(status[0]))
+        submission.update(id=max(s["id"] for s in status) + 1, contestId=self.contest_id, verdict="OK",
+                          creationTimeSeconds=int(time.time()))
+        submission["problem"]["contestId"] = submission["author"]["contestId"] = self.contest_id
+        status.insert(0, submission)
+
+    def ok(self, key: str, result: Any) -> web.Response:
+        """Response with a result that does not change, serialized on first use."""
+        if key not in self.bodies:
+            self.bodies[key] = json.dumps({"status": "OK", "result": result}).encode()
+        return web.Response(body=self.bodies[key], content_type="application/json")
+
+    async def codeforces(self, request: web.Request) -> web.Response:
+        endpoint = request.match_info["endpoint"]
+        params = request.query
+        if endpoint == "problemset.problems":
+            return self.ok(endpoint, self.problems)
+        elif endpoint == "contest.list":
+            return self.ok(endpoint, self.contests)
+        elif endpoint == "user.ratedList":
+            return self.ok(endpoint, self.rated_list)
+        elif endpoint == "user.info":
+            result = [user_info(h) for h in params["handles"].split(";")]
+        elif endpoint == "user.status":
+            start = int(params.get("from", 1)) - 1
+            count = int(params.get("count", 10 ** 9))
+            result = self.status(params["handle"])[start:start + count]
+        elif endpoint == "contest.standings" and int(params["contestId"]) == self.contest_id:
+            if "handles" not in params:
+                return self.ok(endpoint, {"contest": self.contest, "problems": [], "rows": self.standings})
+            handles = set(params["handles"].split(";"))
+            rows = [r for r in self.standings if r["party"]["members"][0]["handle"] in handles]
+            result = {"contest": self.contest, "problems": [], "rows": rows}
+        elif endpoint == "contest.ratingChanges" and int(params["contestId"]) != self.contest_id:
+            return self.ok(endpoint, self.rating_changes)
+        elif endpoint == "contest.ratingChanges":
+            return web.json_response({
+                "status": "FAILED", "comment": "contestId: Rating changes are unavailable for this contest"
+            }, status=400)
+        else:
+            return web.json_response({"status": "FAILED", "comment": f"{endpoint}: not found"}, status=400)
+        return web.json_response({"status": "OK", "result": result})
+
+    async def predictor(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.predictor_page, content_type="text/html")
+
+    async def clist(self, request: web.Request) -> web.Response:
+        return web.json_response({"meta": {}, "objects": self.clist_contests})
+
+    async def bot_api(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        data = dict(await request.post()) if request.content_type != "application/json" else await request.json()
+        self.telegram.append((method, data))
+
+        if method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "stub", "username": "stub_bot"}
+        elif method.startswith("send"):
+            result = {
+                "message_id": len(self.telegram),
+                "date": int(time.time()),
+                "chat": {"id": int(data.get("chat_id", CHAT_ID)), "type": "supergroup"}
+            }
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    async def cf_update(self, request: web.Request) -> web.Response:
+        return web.json_response({"success": True})
@@ -0,0 +1,32 @@
+import statistics
+import time
+from typing import Any, Awaitable, Callable
+
+
+def summarize(seconds: list[float]) -> dict[str, float]:
+    seconds = sorted(seconds)
+    return {
+        "n": len(seconds),
+        "min_ms": seconds[0] * 1000,
+        "p50_ms": statistics.median(seconds) * 1000,
+        "p95_ms": seconds[max(0, int(len(seconds) * 0.95) - 1)] * 1000,
+        "max_ms": seconds[-1] * 1000
+    }
+
+
+def time_calls(func: Callable[[], Any], repeat: int) -> list[float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def atime_calls(func: Callable[[], Awaitable], repeat: int) -> list[float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await func()
+        samples.append(time.perf_counter() - start)
+    return samples
@@ -0,0 +1,156 @@
+"""Concurrent-update throughput of the webhook.
+
+Posts synthetic Telegram updates to the bot and reports throughput and latency.
+The replies come back in the HTTP responses, so nothing is sent to Telegram
+(except for /delta, which is forwarded to cf_update).
+
+Without a URL, the Flask bot (as deployed before, gunicorn with two sync
+workers) and the aiohttp webhook are served locally against the stub server,
+which adds LATENCY seconds to every Codeforces and Clist response. Each /stalk
+update comes from a different member, so every one of them asks Codeforces.
+
+    python -m benchmarks.webhook_load
+    python -m benchmarks.webhook_load http://localhost:8080/ --text /stalk --user-id 123
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import statistics
+import threading
+import time
+from typing import Any, Iterator, Sequence
+
+from aiohttp import ClientSession
+
+from benchmarks.commands import GROUP_SIZE, flask_bot, use_handles, webhook_app
+from benchmarks.stub_server import CHAT_ID, StubServer, install_config
+
+LATENCY = 0.05
+FLASK_WORKERS = 2  # gunicorn -w 2 tgbot.bot:app
+COMMANDS = ["/help", "/stalk"]
+
+
+def update(i: int, text: str, user_id: int, chat_id: int) -> dict:
+    return {
+        "update_id": i,
+        "message": {
+            "message_id": i,
+            "from": {"id": user_id, "is_bot": False, "first_name": "load"},
+            "chat": {"id": chat_id, "type": "group"},
+            "date": int(time.time()),
+            "text": text
+        }
+    }
+
+
+async def load(url: str, updates: int = 200, concurrency: int = 20, text: str = "/help",
+               user_ids: Sequence[int] = (0,), chat_id: int = 0) -> dict[str, float]:
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(session: ClientSession, i: int) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            async with session.post(url, json=update(i, text, user_ids[i % len(user_ids)], chat_id)) as resp:
+                await resp.read()
+            latencies.append(time.perf_counter() - start)
+
+    async with ClientSession() as session:
+        start = time.perf_counter()
+        await asyncio.gather(*(send(session, i) for i in range(updates)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "updates_per_sec": updates / elapsed,  # not suffixed _s, which `benchmarks.run` takes as lower is better
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "max_ms": latencies[-1] * 1000
+    }
+
+
+@contextlib.contextmanager
+def serve_flask(stub: StubServer) -> Iterator[str]:
+    from werkzeug.serving import make_server
+
+    bot = flask_bot(stub)
+    bot.app.before_first_request_funcs.clear()  # warm_up would reach Telegram and GCP
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    workers = threading.Semaphore(FLASK_WORKERS)
+
+    def app(environ: dict[str, Any], start_response: Any) -> Any:
+        with workers:
+            return bot.app(environ, start_response)
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}/"
+    finally:
+        server.shutdown()
+        thread.join()
+
+
+@contextlib.contextmanager
+def serve_aiohttp(stub: StubServer) -> Iterator[str]:
+    """The webhook in its own event loop, so that it does not share one with the load."""
+    from aiohttp import web
+
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    stack = contextlib.AsyncExitStack()
+
+    async def start() -> str:
+        runner = web.AppRunner(await webhook_app(stack, stub), access_log=None)
+        await runner.setup()
+        stack.push_async_callback(runner.cleanup)
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        return f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/"
+
+    try:
+        yield asyncio.run_coroutine_threadsafe(start(), loop).result()
+    finally:
+        asyncio.run_coroutine_threadsafe(stack.aclose(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+def run(updates: int = GROUP_SIZE, concurrency: int = 20) -> dict[str, Any]:
+    results = {}
+    with StubServer(latency=LATENCY) as stub:
+        install_config(stub.url)
+        use_handles(stub)
+        for name, serve in (("flask", serve_flask), ("aiohttp", serve_aiohttp)):
+            try:
+                with serve(stub) as url:
+                    results[name] = {
+                        text: asyncio.run(load(url, updates, concurrency, text, range(GROUP_SIZE), CHAT_ID))
+                        for text in COMMANDS
+                    }
+            except ImportError as e:
+                results[name] = {"error": f"{type(e).__name__}: {e!s}"}
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("url", nargs="?", help="a running bot (default: compare Flask and aiohttp locally)")
+    parser.add_argument("--updates", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--text", default="/help")
+    parser.add_argument("--user-id", type=int, default=0)
+    parser.add_argument("--chat-id", type=int, default=0)
+    args = parser.parse_args()
+
+    if not args.url:
+        print(json.dumps(run(concurrency=args.concurrency), indent=2))
+    else:
+        r = asyncio.run(load(args.url, args.updates, args.concurrency, args.text, [args.user_id], args.chat_id))
+        print(f"{r['updates_per_sec']:8.1f} updates/s   p50 {r['p50_ms']:8.1f} ms   p95 {r['p95_ms']:8.1f} ms   "
+              f"max {r['max_ms']:8.1f} ms")
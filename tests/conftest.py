@@ -0,0 +1,4 @@
+from benchmarks.stub_server import install_config
+
+# tgbot.cf_update reads the config at import time, and there is no tgbot/config.json in a checkout
+install_config()
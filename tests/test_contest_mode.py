@@ -0,0 +1,53 @@
+import asyncio
+import time
+
+from tgbot.cf_update import contest_mode
+from tgbot.cf_update.contest_mode import ContestWatcher
+from tgbot.cf_update.scheduler import PollScheduler
+from tgbot.codeforces import ContestPhase
+
+
+class Contest:
+    def __init__(self, id: int, phase: ContestPhase, start: float):
+        self.id = id
+        self.phase = phase
+        self.startTimeSeconds = start
+
+
+class ContestsCache:
+    def __init__(self):
+        self.contests = None
+
+    def clear(self) -> None:
+        self.contests = None
+
+
+class FakeClient:
+    """Serves the contest list from its cache, as the real client does within the cache TTL."""
+
+    def __init__(self, contests: list[Contest]):
+        self.contests = contests
+        self.contests_cache = ContestsCache()
+
+    async def get_contests(self, phases: tuple = ()) -> list[Contest]:
+        if self.contests_cache.contests is None:
+            self.contests_cache.contests = [Contest(c.id, c.phase, c.startTimeSeconds) for c in self.contests]
+        return [c for c in self.contests_cache.contests if not phases or c.phase in phases]
+
+    async def get_standings(self, contest_id: int, handles: list[str], show_unofficial: bool = False):
+        return next(c for c in self.contests if c.id == contest_id), []
+
+
+def test_contest_is_watched_once_it_is_due_to_start(monkeypatch):
+    monkeypatch.setattr(contest_mode, "START_RECHECK_INTERVAL", 0)
+    contest = Contest(1000, ContestPhase.BEFORE, time.time() + 0.05)
+    watcher = ContestWatcher(FakeClient([contest]), PollScheduler())
+
+    asyncio.run(watcher.poll(["tourist"]))
+    assert not watcher.is_live()
+
+    # The round starts, long before the cached contest list expires
+    time.sleep(0.05)
+    contest.phase = ContestPhase.CODING
+    asyncio.run(watcher.poll(["tourist"]))
+    assert watcher.is_live()
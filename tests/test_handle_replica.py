@@ -0,0 +1,34 @@
+from tgbot.handle_replica import HandleReplica, InMemoryHandleBackend
+
+
+class SilentBackend(InMemoryHandleBackend):
+    """A backend whose first snapshot has not arrived yet."""
+
+    def watch(self, on_change):
+        self.listeners.append(on_change)
+
+
+def test_lookups_read_the_backend_until_the_first_snapshot():
+    backend = SilentBackend({"1": "tourist", "2": "Petr"})
+    replica = HandleReplica(backend, load_timeout=0.01)
+
+    # A member who registered before a cold start is not declined
+    assert replica.get_handle(1) == "tourist"
+    assert replica.get_owners("Petr") == ["2"]
+    assert sorted(replica.get_handles()) == ["Petr", "tourist"]
+    assert replica.get_handle(3) is None
+
+    backend.listeners[0](dict(backend.handles))
+    backend.handles.clear()  # from now on, lookups must be answered by the replica
+    assert replica.get_handle(1) == "tourist"
+
+
+def test_changes_reach_the_replica():
+    backend = InMemoryHandleBackend({"1": "tourist"})
+    replica = HandleReplica(backend)
+
+    assert replica.get_handle(1) == "tourist"
+    backend.set("1", None)
+    backend.set("2", "tourist")
+    assert replica.get_handle(1) is None
+    assert replica.get_owners("tourist") == ["2"]
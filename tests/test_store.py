@@ -0,0 +1,21 @@
+import asyncio
+import json
+
+from tests.test_sync import submission
+from tgbot.cf_update.store import SubmissionStore
+
+
+def test_tinydb_migration_keeps_contest_submissions_pending(tmp_path):
+    tinydb_path = tmp_path / "db.json"
+    status = [submission(11), submission(10, participant_type="PRACTICE")]
+    tinydb_path.write_text(json.dumps({"_default": {"1": {"handle": "tourist", "status": status}}}))
+
+    async def migrate():
+        async with SubmissionStore(str(tmp_path / "cf_update.sqlite3"), tinydb_path=str(tinydb_path)) as store:
+            return store.get_state("tourist")
+
+    state = asyncio.run(migrate())
+    # The contest may still be running, so system test verdicts of submission 11 must not be lost
+    assert state.pending.keys() == {11}
+    assert state.max_final_id == 10
+    assert not tinydb_path.exists()
@@ -0,0 +1,120 @@
+import asyncio
+import copy
+from typing import Any, Optional
+
+import pytest
+
+from benchmarks.fixtures import user_status
+from tgbot.cf_update.sync import SyncState, get_finished_contest_ids
+from tgbot.codeforces import CodeforcesError, CodeforcesUnavailableError, ContestPhase
+
+TEMPLATE = user_status(n=1)[0]
+
+
+def submission(
+        id: int,
+        contest_id: int = 1000,
+        participant_type: str = "CONTESTANT",
+        verdict: Optional[str] = "OK",
+        testset: str = "PRETESTS"
+) -> dict[str, Any]:
+    s = copy.deepcopy(TEMPLATE)
+    s.update(id=id, contestId=contest_id, verdict=verdict, testset=testset, passedTestCount=10)
+    s["author"].update(contestId=contest_id, participantType=participant_type)
+    s["author"].pop("teamId", None)
+    s["problem"]["contestId"] = contest_id
+    return s
+
+
+def test_contest_submission_stays_pending_until_contest_is_finished():
+    state = SyncState(max_final_id=5)
+    ok = submission(10)
+    state.advance([ok], finished_contest_ids=())
+    assert state.pending.keys() == {10}
+    assert state.max_final_id == 5
+
+    # Hacked after the cached contest list stopped showing the round as live
+    hacked = dict(ok, verdict="WRONG_ANSWER")
+    assert [s.id for s in state.updates([hacked])] == [10]
+    state.advance([hacked], finished_contest_ids=())
+    assert state.updates([hacked]) == []
+
+    # System tests change the verdict again, then the contest is finished
+    failed = dict(hacked, testset="TESTS", verdict="TIME_LIMIT_EXCEEDED")
+    assert [s.id for s in state.updates([failed])] == [10]
+    state.advance([failed], finished_contest_ids={1000})
+    assert state.pending == {}
+    assert state.max_final_id == 10
+
+
+def test_practice_submission_is_final_once_judged():
+    state = SyncState()
+    state.advance([
+        submission(11, participant_type="PRACTICE"),
+        submission(10, participant_type="PRACTICE", verdict="TESTING")
+    ], finished_contest_ids=())
+    assert state.max_final_id == 11
+    assert state.pending.keys() == {10}
+
+
+def test_final_submission_is_not_pending_again():
+    state = SyncState()
+    state.advance([submission(10)], finished_contest_ids={1000})
+    assert state.max_final_id == 10
+
+    # The contest of an old submission does not have to be looked up again
+    state.advance([submission(11, contest_id=1001), submission(10)], finished_contest_ids=())
+    assert state.pending.keys() == {11}
+    assert state.max_final_id == 10
+    assert [s["id"] for s in state.unsettled([submission(11, contest_id=1001), submission(10)])] == [11]
+
+
+def test_new_submissions_are_updates():
+    state = SyncState(max_final_id=10)
+    assert [s.id for s in state.updates([submission(12), submission(11), submission(10)])] == [12, 11]
+
+
+class Contest:
+    def __init__(self, id: int, phase: ContestPhase):
+        self.id = id
+        self.phase = phase
+
+
+class FakeClient:
+    def __init__(self, listed: list[Contest], contests: dict[int, Any]):
+        self.listed = listed
+        self.contests = contests
+        self.looked_up = []
+
+    async def get_contests(self, phases: tuple = ()) -> list[Contest]:
+        return self.listed
+
+    async def get_contest(self, contest_id: int) -> Contest:
+        self.looked_up.append(contest_id)
+        result = self.contests[contest_id]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+def test_finished_contests_are_confirmed_by_phase():
+    client = FakeClient(
+        [Contest(1000, ContestPhase.FINISHED), Contest(1001, ContestPhase.SYSTEM_TEST)],
+        {
+            1002: Contest(1002, ContestPhase.CODING),  # started after the list was cached
+            100001: Contest(100001, ContestPhase.FINISHED),  # gym
+            100002: CodeforcesError("contestId: Contest with id 100002 not found")
+        }
+    )
+    submissions = [
+        submission(i, contest_id=cid) for i, cid in enumerate([1000, 1001, 1002, 100001, 100002])
+    ] + [submission(9, contest_id=1003, participant_type="PRACTICE")]
+    finished = asyncio.run(get_finished_contest_ids(client, submissions))
+    assert finished == {1000, 100001, 100002}
+    assert sorted(client.looked_up) == [1002, 100001, 100002]
+
+
+def test_finished_contests_raise_when_codeforces_is_down():
+    client = FakeClient([], {1000: CodeforcesUnavailableError()})
+    with pytest.raises(CodeforcesUnavailableError):
+        asyncio.run(get_finished_contest_ids(client, [submission(1)]))
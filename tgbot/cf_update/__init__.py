@@ -2,47 +2,85 @@ import asyncio
 import contextlib
 import logging
 import random
+import time
 import traceback
+from collections import defaultdict
 from datetime import timedelta
+from typing import Optional
 
 import aiocron
-from aiohttp import ClientSession, web, ClientResponseError
+from aiohttp import ClientSession, web
 from aiohttp.web_exceptions import HTTPMethodNotAllowed, HTTPNotFound
 from aiohttp_middlewares import error_context, error_middleware
-from aiotinydb import AIOTinyDB
-from prettytable import PrettyTable
 from telegram.constants import ParseMode
 from telegram.ext import Application, Defaults
-from tinydb import Query
-
-from tgbot.cf_update.predicted_deltas import get_predicted_deltas
+from telegram.request import HTTPXRequest
+
+from tgbot.cf_update.contest_mode import LIVE_PHASES, ContestWatcher
+from tgbot.cf_update.delta_tables import DeltaTables
+from tgbot.cf_update.outbox import Outbox
+from tgbot.cf_update.predicted_deltas import cache as predicted_deltas_cache
+from tgbot.cf_update.rating_predictor import RatingPredictor
+from tgbot.cf_update.scheduler import PollScheduler
 from tgbot.cf_update.stickers import FAILED_STICKERS, OK_STICKERS, UPCOMING_CONTEST_STICKERS
+from tgbot.cf_update.store import SubmissionStore
+from tgbot.cf_update.sync import MAX_SYNC_DEPTH, Fingerprint, SyncState, fetch_unsynced, get_finished_contest_ids
 from tgbot.clist import AsyncClistAPI
 from tgbot.clist.models import ContestInfo
-from tgbot.codeforces import AsyncCodeforcesAPI, CodeforcesError, Contest, ContestPhase, Submission
+from tgbot.codeforces import AsyncCodeforcesAPI, CodeforcesError, ParticipantType, User
 from tgbot.config import config
+from tgbot.metrics import (
+    CONTENT_TYPE, Histogram, client_gauges, gauge, merge, render, shared_families, stats_gauges, track,
+    upstream_errors, waited
+)
+from tgbot.rate_limit import AsyncTokenBucket
 from tgbot.utils import HKT, hkt_now
 
 logging.basicConfig(level="INFO", format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
 routes = web.RouteTableDef()
-lock = asyncio.Lock()
-delta_lock = asyncio.Lock()
+lock = asyncio.Lock()  # guards the set of handles
+handle_locks: defaultdict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+USER_INFO_CHUNK_SIZE = 300  # handles per user.info request
+CF_API_RATE = config.get("CF_API_RATE", 1)  # requests per second
+POLL_CONCURRENCY = config.get("POLL_CONCURRENCY", 8)
+POLL_MIN_INTERVAL = config.get("POLL_MIN_INTERVAL", 5)  # seconds between polls of an active member
+POLL_MAX_INTERVAL = config.get("POLL_MAX_INTERVAL", 10 * 60)  # seconds between polls of an idle member
+POLL_BACKOFF = config.get("POLL_BACKOFF", 2)
+POLL_ACTIVE_WINDOW = config.get("POLL_ACTIVE_WINDOW", 30 * 60)  # members who submitted this recently are active
+POLL_COVERED_INTERVAL = config.get("POLL_COVERED_INTERVAL", 60)  # seconds between polls of a watched contestant
+STANDINGS_INTERVAL = config.get("STANDINGS_INTERVAL", 5)  # seconds between standings polls during a contest
+CONTEST_CHECK_INTERVAL = 60  # seconds between checks for live contests
+USER_REFRESH_INTERVAL = 60
+DELTA_REFRESH_INTERVAL = config.get("DELTA_REFRESH_INTERVAL", 2 * 60)  # seconds between rebuilds of predicted deltas
+DELTA_CHECK_INTERVAL = 30  # seconds between checks for stale delta tables
+
+poll_seconds = Histogram("cf_update_poll_seconds", "Time to poll one handle", ("result",))
+users_refresh_seconds = Histogram("cf_update_users_refresh_seconds", "Time to refresh the users of all handles")
+
+
+class MeteredRequest(HTTPXRequest):
+    """Records the latency and errors of Telegram Bot API requests per method."""
+
+    async def do_request(self, url: str, method: str, *args, **kwargs) -> tuple[int, bytes]:
+        endpoint = url.rsplit("/", 1)[-1]
+        with track("telegram", endpoint):
+            code, payload = await super().do_request(url, method, *args, **kwargs)
+        if not 200 <= code < 300:
+            upstream_errors.inc("telegram", endpoint, f"HTTP {code}")
+        return code, payload
 
 
 def get_handles(app: web.Application) -> list[str]:
-    users = app["db"].all()
-    return [user["handle"] for user in users]
+    return app["store"].handles()
 
 
 async def init_user(app: web.Application, handle: str) -> None:
-    status = await app["cf_client"].get_status(handle, count=100)
-    user = {
-        "handle": handle,
-        "status": [s.dict() for s in status]
-    }
-    app["db"].insert(user)
+    submissions = await app["cf_client"].get_raw_status(handle, count=MAX_SYNC_DEPTH)
+    state = SyncState.from_submissions(submissions, await get_finished_contest_ids(app["cf_client"], submissions))
+    await app["store"].add_handle(handle, state)
 
 
 @routes.post("/")
@@ -55,93 +93,57 @@ async def init(request: web.Request) -> web.Response:
     handles = set(data["handles"])
     logger.info(f"Init handles: {list(handles)}")
 
-    async with lock:
+    async with waited(lock, "handles"):
         # Delete absent handles
-        for handle in get_handles(request.app):
-            if handle in handles:
-                handles.remove(handle)
-            else:
-                request.app["db"].remove(Query().handle == handle)
+        absent_handles = [h for h in get_handles(request.app) if h not in handles]
+        await request.app["store"].remove_handles(absent_handles)
+        for handle in absent_handles:
+            handle_locks.pop(handle, None)
+        handles -= set(get_handles(request.app))
 
         # Initialize new handles
         await asyncio.gather(*[init_user(request.app, handle) for handle in handles])
+        request.app["scheduler"].sync(get_handles(request.app))
 
     return web.json_response({"success": True})
 
 
-def create_table(rows: list[tuple[int, str, str]]) -> PrettyTable:
-    table = PrettyTable(["#", "Handle", "∆"], sortby="#", align="r")
-    table.header_align = "c"
-    table.align["Handle"] = "l"
-
-    table.add_rows(rows)
-    return table
-
-
-async def get_delta_table(app: web.Application, contest: Contest, handles: list[str]) -> str:
-    predict = True
-    if hkt_now() > contest.end_time:
-        # Try to get actual rating changes
+async def send_delta(app: web.Application, chat_id: int) -> None:
+    delta_tables = app["delta_tables"]
+    if not delta_tables.is_ready():
+        # Only until the first background refresh is done
+        asyncio.create_task(
+            app["bot"].send_chat_action(chat_id, "typing")
+        )
+        async with waited(lock, "handles"):
+            handles = get_handles(app)
         try:
-            rating_changes = await app["cf_client"].get_rating_changes(contest.id)
-            assert rating_changes
+            await delta_tables.refresh(app, handles)
         except CodeforcesError as e:
-            if "Rating changes are unavailable" not in str(e):
-                raise e from None
-        except AssertionError:
-            pass
-        else:
-            predict = False
-
-    if predict:
-        try:
-            async with delta_lock:
-                rating_changes = await get_predicted_deltas(app, contest.id)
-        except ClientResponseError as e:
-            return f"{e.status} {e.message}"
-        rows = [rating_changes[h] for h in handles if h in rating_changes]
-    else:
-        rows = [rating_changes[h].get_table_row() for h in handles if h in rating_changes]
-
-    if rows:
-        table = create_table(rows)
-        return (
-            f"{'Predicted' if predict else 'Official'} rating changes for {contest.linked_name}\n"
-            f"<pre>{table}</pre>"
-        )
-    else:
-        return f"No members are competing in {contest.linked_name}"
-
+            asyncio.create_task(
+                app["bot"].send_message(chat_id, str(e))
+            )
+            return
 
-async def send_delta(app: web.Application, chat_id: int) -> None:
     asyncio.create_task(
-        app["bot"].send_chat_action(chat_id, "typing")
+        app["bot"].send_message(chat_id, delta_tables.text())
     )
 
-    async with lock:
-        handles = get_handles(app)
 
-    # Get the most recent contest(s)
-    try:
-        contests = await app["cf_client"].get_contests(phases=())
-    except CodeforcesError as e:
-        asyncio.create_task(
-            app["bot"].send_message(chat_id, str(e))
-        )
-        return
-
-    contests = [c for c in contests if c.phase != ContestPhase.BEFORE]
-    contests.sort(key=lambda c: (c.startTimeSeconds, c.id))
-    contests = [c for c in contests if c.startTimeSeconds == contests[-1].startTimeSeconds]
-
-    results = await asyncio.gather(*[get_delta_table(app, c, handles) for c in contests])
-    text = "\n\n".join(results)
-    if any(c.phase == ContestPhase.SYSTEM_TEST for c in contests):
-        text += "\n\nSystem testing is ongoing. The deltas are not yet finalized."
-
-    asyncio.create_task(
-        app["bot"].send_message(chat_id, text)
-    )
+async def refresh_delta_tables_forever(app: web.Application) -> None:
+    await asyncio.sleep(1)
+    delta_tables = app["delta_tables"]
+    while True:
+        async with waited(lock, "handles"):
+            handles = get_handles(app)
+        try:
+            for table in await delta_tables.refresh(app, handles):
+                app["outbox"].notify(config["CHAT_ID"], table.text)
+        except CodeforcesError as e:
+            logger.warning(f"{type(e).__name__}: {e!s}")
+        except Exception as e:
+            logger.error("".join(traceback.format_exception(type(e), e, e.__traceback__)))
+        await asyncio.sleep(DELTA_CHECK_INTERVAL)
 
 
 @routes.post("/delta")
@@ -155,60 +157,179 @@ async def command_delta(request: web.Request) -> web.Response:
     return web.json_response({"success": True})
 
 
-async def db_retrieve_status(app: web.Application, handle: str) -> list[Submission]:
-    users = app["db"].search(Query().handle == handle)
-    status = users[0]["status"]
-    status = [Submission(**s) for s in status]
-    return status
+async def get_users(app: web.Application, handles: list[str]) -> dict[str, User]:
+    """Get users keyed by lowercase handle, with one user.info request per chunk of handles."""
+    users = {}
+    for i in range(0, len(handles), USER_INFO_CHUNK_SIZE):
+        chunk_users = await fetch_users(app, handles[i:i + USER_INFO_CHUNK_SIZE])
+        users.update((u.handle.lower(), u) for u in chunk_users)
+    return users
 
 
-async def update_status(app: web.Application, handle: str) -> None:
+async def fetch_users(app: web.Application, handles: list[str]) -> list[User]:
+    """Users of the handles, without those Codeforces does not know.
+
+    As in RatingPredictor.fetch_ratings, a failed request is split in halves
+    until the unknown handles are singled out.
+    """
     try:
-        async with lock:
-            user, old_status, new_status = await asyncio.gather(
-                app["cf_client"].get_user(handle),
-                db_retrieve_status(app, handle),
-                app["cf_client"].get_status(handle, count=100)
-            )
+        return await app["cf_client"].get_users(*handles)
+    except CodeforcesError as e:
+        if str(e) != "Not found":
+            raise e from None
+    if len(handles) == 1:
+        logger.warning(f"Could not get user {handles[0]}")
+        return []
+    mid = len(handles) // 2
+    return await fetch_users(app, handles[:mid]) + await fetch_users(app, handles[mid:])
+
+
+def is_active(submissions: list[Fingerprint], live_contest_ids: set[int]) -> bool:
+    """Whether a member is likely to have new or changing verdicts soon."""
+    now = time.time()
+    return any(
+        s.verdict is None or s.verdict == "TESTING"
+        or now - s.creationTimeSeconds < POLL_ACTIVE_WINDOW
+        or (s.contestId in live_contest_ids and s.participantType == ParticipantType.CONTESTANT)
+        for s in submissions
+    )
 
-            status_dict = {s.id: s for s in old_status}
-            updated_status = [s for s in new_status if s.id not in status_dict or status_dict[s.id] != s]
 
-            contest_ids = {s.author.contestId for s in updated_status}
+async def update_status(app: web.Application, handle: str, user: User) -> Optional[bool]:
+    """Poll a handle and announce updated submissions. Returns whether the member is active."""
+    notifications = []
+    try:
+        async with waited(handle_locks[handle], "handle"):
+            state = app["store"].get_state(handle)
+            submissions, live_contests = await asyncio.gather(
+                fetch_unsynced(app["cf_client"], handle, state),
+                app["cf_client"].get_contests(phases=LIVE_PHASES)
+            )
+            live_contest_ids = {c.id for c in live_contests}
+            updated_status = state.updates(submissions)
+            active = bool(updated_status) or is_active(
+                [Fingerprint.of(s) for s in submissions] + list(state.pending.values()),
+                live_contest_ids
+            )
+
             # Get all contests simultaneously and cache them
-            await asyncio.gather(*(app["cf_client"].get_contest(cid) for cid in contest_ids))
+            contest_ids = list({s.author.contestId for s in updated_status})
+            contests = await asyncio.gather(*(app["cf_client"].get_contest(cid) for cid in contest_ids))
+            contests = dict(zip(contest_ids, contests))
 
             for submission in updated_status[::-1]:  # Chronological order
-                contest = await app["cf_client"].get_contest(submission.author.contestId)
-                if submission.should_notify(user, contest):
-                    await app["bot"].send_message(config["CHAT_ID"], str(submission))
-
-                    sticker = random.choice(OK_STICKERS if submission.verdict == "OK" else FAILED_STICKERS)
-                    await app["bot"].send_sticker(config["CHAT_ID"], sticker)
+                if submission.should_notify(user, contests[submission.author.contestId]):
+                    notifications.append(submission)
 
-            app["db"].update(
-                {"status": [s.dict() for s in new_status]},
-                Query().handle == handle
-            )
+            finished_contest_ids = await get_finished_contest_ids(app["cf_client"], state.unsettled(submissions))
+            state.advance(submissions, finished_contest_ids)
+            await app["store"].save_state(handle, state)
     except CodeforcesError as e:
         logger.warning(f"{type(e).__name__}: {e!s}")
+        return None
+
+    for submission in notifications:
+        sticker = random.choice(OK_STICKERS if submission.verdict == "OK" else FAILED_STICKERS)
+        app["outbox"].notify(config["CHAT_ID"], str(submission), sticker)
+
+    return active
+
+
+async def poll_worker(app: web.Application) -> None:
+    scheduler = app["scheduler"]
+    breaker = app["cf_client"].resilience.breaker
+    while True:
+        # Polling pauses while Codeforces is down, until the circuit lets a probe through
+        while (delay := breaker.retry_after()) > 0:
+            await asyncio.sleep(delay)
+        handle = await scheduler.next()
+        active = None
+        start = time.perf_counter()
+        try:
+            if (user := app["users"].get(handle.lower())) is None:
+                user = await app["cf_client"].get_user(handle)
+                app["users"][handle.lower()] = user
+            active = await update_status(app, handle, user)
+        except CodeforcesError as e:
+            logger.warning(f"{type(e).__name__}: {e!s}")
+        except Exception as e:
+            logger.error("".join(traceback.format_exception(type(e), e, e.__traceback__)))
+        finally:
+            scheduler.report(handle, active)
+            poll_seconds.observe(time.perf_counter() - start, "failed" if active is None else "ok")
 
 
 async def update_status_forever(app: web.Application) -> None:
+    # Handles are polled by POLL_CONCURRENCY workers in the order given by the scheduler.
+    # The rate limiter of cf_client keeps the total request rate within budget.
+    # This loop keeps the scheduled handles and their ratings up to date.
     await asyncio.sleep(1)
+    workers = []
+    try:
+        while True:
+            async with waited(lock, "handles"):
+                handles = get_handles(app)
+            app["scheduler"].sync(handles)
+
+            try:
+                with users_refresh_seconds.time():
+                    app["users"] = await get_users(app, handles)
+            except CodeforcesError as e:
+                logger.warning(f"{type(e).__name__}: {e!s}")
+
+            if not workers:
+                workers = [asyncio.create_task(poll_worker(app)) for _ in range(POLL_CONCURRENCY)]
+            await asyncio.sleep(USER_REFRESH_INTERVAL)
+    finally:
+        for worker in workers:
+            worker.cancel()
+
+
+async def watch_contests_forever(app: web.Application) -> None:
+    await asyncio.sleep(1)
+    watcher = app["contest_watcher"]
     while True:
-        async with lock:
+        async with waited(lock, "handles"):
             handles = get_handles(app)
+        try:
+            await watcher.poll(handles)
+        except CodeforcesError as e:
+            logger.warning(f"{type(e).__name__}: {e!s}")
+        except Exception as e:
+            logger.error("".join(traceback.format_exception(type(e), e, e.__traceback__)))
+        await asyncio.sleep(STANDINGS_INTERVAL if watcher.is_live() else CONTEST_CHECK_INTERVAL)
 
-        for handle in handles:
-            try:
-                # At least 2s between each update
-                await asyncio.gather(update_status(app, handle), asyncio.sleep(1.8))
-                await asyncio.sleep(0.2)
-            except asyncio.CancelledError:
-                return
-            except Exception as e:
-                logger.error("".join(traceback.format_exception(type(e), e, e.__traceback__)))
+
+@routes.get("/scheduler")
+async def scheduler_stats(request: web.Request) -> web.Response:
+    if request.headers.get("X-Auth-Token") != config["SECRET"]:
+        logger.warning("Endpoint /scheduler was accessed without authentication")
+        return web.json_response({"success": False, "reason": "Authentication failed"})
+
+    return web.json_response({"success": True, "handles": request.app["scheduler"].stats()})
+
+
+@routes.get("/metrics")
+async def metrics(request: web.Request) -> web.Response:
+    if request.headers.get("X-Auth-Token") != config["SECRET"]:
+        logger.warning("Endpoint /metrics was accessed without authentication")
+        return web.json_response({"success": False, "reason": "Authentication failed"})
+
+    app = request.app
+    scheduler = app["scheduler"]
+    queues = {**scheduler.queue_stats(), "outbox": app["outbox"].queued()}
+    families = [
+        *shared_families(),
+        poll_seconds.collect(),
+        users_refresh_seconds.collect(),
+        *stats_gauges("cf_update_handle", "handle", scheduler.stats()),
+        gauge("cf_update_queue_depth", "Items waiting to be processed", [
+            ({"queue": queue}, depth) for queue, depth in queues.items()
+        ]),
+        *merge(client_gauges(cf_client=app["cf_client"], clist_client=app["clist_client"])
+               + stats_gauges("tgbot_cache", "cache", {"cf_predictor": predicted_deltas_cache.stats()}, client="delta"))
+    ]
+    return web.Response(body=render(families).encode(), headers={"Content-Type": CONTENT_TYPE})
 
 
 async def send_poll(app: web.Application, contests: list[ContestInfo]) -> None:
@@ -272,7 +393,9 @@ async def startup(app: web.Application) -> None:
     context_stack = contextlib.AsyncExitStack()
     app["context_stack"] = context_stack
 
-    app["cf_client"] = await context_stack.enter_async_context(AsyncCodeforcesAPI())
+    app["cf_client"] = await context_stack.enter_async_context(
+        AsyncCodeforcesAPI(rate_limiter=AsyncTokenBucket(CF_API_RATE))
+    )
     app["clist_client"] = await context_stack.enter_async_context(
         AsyncClistAPI(config["CLIST_API_KEY"])
     )
@@ -280,18 +403,27 @@ async def startup(app: web.Application) -> None:
     # aiohttp session
     app["session"] = await context_stack.enter_async_context(ClientSession(raise_for_status=True))
 
-    app["db"] = await context_stack.enter_async_context(AIOTinyDB("db.json"))
+    app["store"] = await context_stack.enter_async_context(SubmissionStore())
+    app["users"] = {}
+    app["scheduler"] = PollScheduler(POLL_MIN_INTERVAL, POLL_MAX_INTERVAL, POLL_BACKOFF, POLL_COVERED_INTERVAL)
+    app["contest_watcher"] = ContestWatcher(app["cf_client"], app["scheduler"])
+    app["predictor"] = RatingPredictor(app["cf_client"])
+    app["delta_tables"] = DeltaTables(DELTA_REFRESH_INTERVAL)
 
     application = (
         Application.builder()
         .token(config["TOKEN"])
         .defaults(Defaults(parse_mode=ParseMode.HTML, disable_web_page_preview=True))
+        .request(MeteredRequest(connection_pool_size=128))  # the default pool size of Application.builder()
         .build()
     )
     app["bot"] = await context_stack.enter_async_context(application.bot)
+    app["outbox"] = await context_stack.enter_async_context(Outbox(app["bot"]))
 
     aiocron.crontab("*/5 * * * *", func=notify_upcoming_contest, args=(app,), tz=HKT)
     asyncio.create_task(update_status_forever(app))
+    asyncio.create_task(watch_contests_forever(app))
+    asyncio.create_task(refresh_delta_tables_forever(app))
 
 
 async def cleanup(app: web.Application) -> None:
@@ -0,0 +1,136 @@
+import logging
+import time
+from typing import Any, Optional
+
+from tgbot.cf_update.scheduler import PollScheduler
+from tgbot.codeforces import AsyncCodeforcesAPI, CodeforcesError, CodeforcesUnavailableError, ContestPhase
+
+logger = logging.getLogger(__name__)
+
+STANDINGS_CHUNK_SIZE = 300  # handles per contest.standings request
+MAX_STANDINGS_FAILURES = 3  # consecutive failures after which a contest is no longer watched
+LIVE_PHASES = (ContestPhase.CODING, ContestPhase.PENDING_SYSTEM_TEST, ContestPhase.SYSTEM_TEST)
+START_RECHECK_INTERVAL = 30  # seconds between contest list refreshes while a due contest is not shown as started
+
+
+def row_signature(row: dict[str, Any]) -> tuple:
+    """Changes whenever a verdict of the participant changes the standings."""
+    return tuple(
+        (r.get("points"), r.get("rejectedAttemptCount"), r.get("type"))
+        for r in row["problemResults"]
+    )
+
+
+class ContestWatcher:
+    """Watches the standings of running contests for our members.
+
+    Members whose standings row changed are polled right away. Participants are
+    covered by the watcher, so the scheduler does not need to poll them at the
+    active rate. When a contest finishes, all participants are polled once more
+    to pick up verdicts changed by system tests. The cached contest list is
+    refreshed once a contest is due to start, so new rounds are noticed promptly.
+    """
+
+    def __init__(self, cf_client: AsyncCodeforcesAPI, scheduler: PollScheduler):
+        self.cf_client = cf_client
+        self.scheduler = scheduler
+        self.phases: dict[int, ContestPhase] = {}  # contests being watched
+        self.signatures: dict[tuple[int, str], tuple] = {}
+        self.participants: dict[int, set[str]] = {}
+        self.finished: set[int] = set()
+        self.failures: dict[int, int] = {}
+        self.versions: dict[int, int] = {}  # of the members' standings rows
+        self.next_start: Optional[float] = None  # when the contest list is due to change
+
+    def is_live(self) -> bool:
+        return bool(self.phases)
+
+    def standings_version(self, contest_id: int) -> Optional[int]:
+        """Changes whenever the standings row of a member changes, None unless the contest is watched."""
+        return self.versions.get(contest_id)
+
+    async def poll(self, handles: list[str]) -> None:
+        if not handles:
+            return
+
+        if self.next_start is not None and time.time() >= self.next_start:
+            # A round is due to start, which the cached contest list does not show yet
+            self.cf_client.contests_cache.clear()
+
+        # The contest list is cached for a few minutes, so it can still list contests we saw finish
+        contests = await self.cf_client.get_contests(phases=())
+        now = time.time()
+        self.next_start = min((
+            max(c.startTimeSeconds, now + START_RECHECK_INTERVAL)
+            for c in contests if c.phase == ContestPhase.BEFORE
+        ), default=None)
+        live_contests = [c for c in contests if c.phase in LIVE_PHASES]
+        self.finished &= {c.id for c in live_contests}
+        for contest in live_contests:
+            if contest.id not in self.finished:
+                self.phases.setdefault(contest.id, contest.phase)
+
+        canonical = {h.lower(): h for h in handles}
+        live_contest_ids = {c.id for c in live_contests}
+        for contest_id in list(self.phases):
+            try:
+                await self.poll_contest(contest_id, handles, canonical)
+            except CodeforcesUnavailableError:
+                raise  # says nothing about the contest
+            except CodeforcesError as e:
+                # e.g. a deleted or private contest, which must not stay "live" forever
+                self.failures[contest_id] = self.failures.get(contest_id, 0) + 1
+                logger.warning(f"Contest {contest_id}: {type(e).__name__}: {e!s}")
+                if contest_id not in live_contest_ids or self.failures[contest_id] >= MAX_STANDINGS_FAILURES:
+                    logger.warning(f"Contest {contest_id}: no longer watched")
+                    self.forget(contest_id)
+                    self.finished.add(contest_id)  # not watched again while the contest list shows it
+            else:
+                self.failures.pop(contest_id, None)
+
+        self.scheduler.covered = set().union(*self.participants.values())
+
+    async def poll_contest(self, contest_id: int, handles: list[str], canonical: dict[str, str]) -> None:
+        participants = set()
+        version = []
+        for i in range(0, len(handles), STANDINGS_CHUNK_SIZE):
+            contest, rows = await self.cf_client.get_standings(
+                contest_id, handles[i:i + STANDINGS_CHUNK_SIZE], show_unofficial=True
+            )
+            for row in rows:
+                party = row["party"]
+                if party.get("teamId") is not None or party["participantType"] not in (
+                        "CONTESTANT", "OUT_OF_COMPETITION"
+                ):
+                    continue
+                if (handle := canonical.get(party["members"][0]["handle"].lower())) is None:
+                    continue
+
+                participants.add(handle)
+                signature = row_signature(row)
+                version.append((handle, row["rank"], signature))
+                if self.signatures.get((contest_id, handle), signature) != signature:
+                    self.scheduler.poke(handle)
+                self.signatures[contest_id, handle] = signature
+
+        self.participants[contest_id] = participants
+        self.versions[contest_id] = hash(frozenset(version))
+        if contest.phase != self.phases[contest_id]:
+            logger.info(f"Contest {contest_id}: {self.phases[contest_id]} -> {contest.phase}")
+            self.cf_client.contests_cache.clear()  # so the contest list shows the new phase
+        self.phases[contest_id] = contest.phase
+
+        if contest.phase == ContestPhase.FINISHED:
+            # Sweep for verdicts changed by system tests
+            for handle in participants:
+                self.scheduler.poke(handle)
+            self.forget(contest_id)
+            self.finished.add(contest_id)
+
+    def forget(self, contest_id: int) -> None:
+        del self.phases[contest_id]
+        self.failures.pop(contest_id, None)
+        self.participants.pop(contest_id, None)
+        self.versions.pop(contest_id, None)
+        for key in [k for k in self.signatures if k[0] == contest_id]:
+            del self.signatures[key]
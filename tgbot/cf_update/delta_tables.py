@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import time
+from datetime import timedelta
+from typing import NamedTuple, Optional
+
+from aiohttp import ClientResponseError, web
+from prettytable import PrettyTable
+
+from tgbot.cf_update.predicted_deltas import get_predicted_deltas
+from tgbot.codeforces import CodeforcesError, ContestPhase
+from tgbot.codeforces.decoders import CompactContest
+from tgbot.metrics import waited
+from tgbot.utils import hkt_now
+
+logger = logging.getLogger(__name__)
+
+PREDICTION_WINDOW = timedelta(days=2)  # unrated contests never get official changes
+NO_CONTESTS_TEXT = "There are no recent contests."
+
+
+class DeltaTable(NamedTuple):
+    contest: CompactContest
+    text: str
+    official: bool
+    members: int  # members in the table
+    built: float
+    standings_version: Optional[int] = None  # see ContestWatcher.standings_version
+
+
+def create_table(rows: list[tuple[int, str, str]]) -> PrettyTable:
+    table = PrettyTable(["#", "Handle", "∆"], sortby="#", align="r")
+    table.header_align = "c"
+    table.align["Handle"] = "l"
+
+    table.add_rows(rows)
+    return table
+
+
+async def build_delta_table(
+        app: web.Application,
+        contest: CompactContest,
+        handles: list[str],
+        standings_version: Optional[int] = None,
+        prediction: Optional[DeltaTable] = None
+) -> DeltaTable:
+    """The official table if there is one yet, else `prediction` if given, else a new prediction."""
+    predict = True
+    if hkt_now() > contest.end_time:
+        # Try to get actual rating changes
+        try:
+            rating_changes = await app["cf_client"].get_rating_changes(contest.id)
+            assert rating_changes
+        except CodeforcesError as e:
+            if "Rating changes are unavailable" not in str(e):
+                raise e from None
+        except AssertionError:
+            pass
+        else:
+            predict = False
+
+    if predict and prediction is not None:
+        return prediction._replace(built=time.monotonic())
+    if predict:
+        try:
+            rating_changes = await app["predictor"].get_predicted_deltas(contest.id, handles)
+        except CodeforcesError as e:
+            logger.warning(f"Falling back to cf-predictor: {type(e).__name__}: {e!s}")
+            try:
+                rating_changes = await get_predicted_deltas(app, contest.id, tuple(sorted(handles)))
+            except ClientResponseError as e:
+                return DeltaTable(contest, f"{e.status} {e.message}", False, 0, time.monotonic())
+        rows = [rating_changes[h] for h in handles if h in rating_changes]
+    else:
+        rows = [rating_changes[h].get_table_row() for h in handles if h in rating_changes]
+
+    if rows:
+        table = create_table(rows)
+        text = (
+            f"{'Predicted' if predict else 'Official'} rating changes for {contest.linked_name}\n"
+            f"<pre>{table}</pre>"
+        )
+    else:
+        text = f"No members are competing in {contest.linked_name}"
+    return DeltaTable(contest, text, not predict, len(rows), time.monotonic(), standings_version)
+
+
+class DeltaTables:
+    """Delta tables of the most recent contest(s), rebuilt in the background until official.
+
+    Predicted tables are rebuilt whenever the phase of a contest changes, and at
+    most every `interval` seconds when the standings of members change. Once a
+    contest has ended, official rating changes are checked for every `interval`
+    seconds. Official tables are final and never rebuilt.
+    """
+
+    def __init__(self, interval: float = 60):
+        self.interval = interval
+        self.tables: dict[int, DeltaTable] = {}
+        self.handles: list[str] = []
+        self.lock = asyncio.Lock()
+
+    def is_ready(self) -> bool:
+        return bool(self.tables)
+
+    def is_stale(self, contest: CompactContest, standings_version: Optional[int]) -> bool:
+        table = self.tables.get(contest.id)
+        if table is None:
+            return True
+        if table.official or hkt_now() > contest.end_time + PREDICTION_WINDOW:
+            return False
+        if table.contest.phase != contest.phase:
+            return True
+        changed = table.standings_version != standings_version or hkt_now() > contest.end_time
+        return changed and time.monotonic() - table.built > self.interval
+
+    def prediction(self, contest: CompactContest, standings_version: Optional[int]) -> Optional[DeltaTable]:
+        """The predicted table of the contest, if the standings it was built from did not change."""
+        table = self.tables.get(contest.id)
+        if table is None or table.contest.phase != contest.phase or table.standings_version != standings_version:
+            return None
+        return table
+
+    async def refresh(self, app: web.Application, handles: list[str]) -> list[DeltaTable]:
+        """Rebuild stale tables. Returns the tables that just became official."""
+        async with waited(self.lock, "delta_tables"):
+            # The most recent contest(s)
+            contests = await app["cf_client"].get_contests(phases=())
+            contests = [c for c in contests if c.phase != ContestPhase.BEFORE]
+            if not contests:
+                return []
+            contests.sort(key=lambda c: (c.startTimeSeconds, c.id))
+            contests = [c for c in contests if c.startTimeSeconds == contests[-1].startTimeSeconds]
+
+            watcher = app["contest_watcher"]
+            versions = {c.id: watcher.standings_version(c.id) for c in contests}
+            if sorted(handles) != self.handles:
+                self.handles = sorted(handles)
+                built = await asyncio.gather(*[build_delta_table(app, c, handles, versions[c.id]) for c in contests])
+            else:
+                built = await asyncio.gather(*[
+                    build_delta_table(app, c, handles, versions[c.id], self.prediction(c, versions[c.id]))
+                    for c in contests if self.is_stale(c, versions[c.id])
+                ])
+            built = {t.contest.id: t for t in built}
+
+            published = [
+                t for cid, t in built.items()
+                if t.official and t.members and cid in self.tables and not self.tables[cid].official
+            ]
+            self.tables = {c.id: built.get(c.id) or self.tables[c.id] for c in contests}
+            return published
+
+    def text(self) -> str:
+        if not self.tables:
+            return NO_CONTESTS_TEXT
+        text = "\n\n".join(t.text for t in self.tables.values())
+        if any(t.contest.phase == ContestPhase.SYSTEM_TEST for t in self.tables.values()):
+            text += "\n\nSystem testing is ongoing. The deltas are not yet finalized."
+        return text
@@ -0,0 +1,104 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+from telegram import Bot
+from telegram.error import NetworkError, RetryAfter, TelegramError, TimedOut
+
+from tgbot.rate_limit import AsyncTokenBucket
+
+logger = logging.getLogger(__name__)
+
+MAX_MESSAGE_LENGTH = 4096
+MAX_ATTEMPTS = 5
+FLUSH_TIMEOUT = 10  # seconds to keep sending at exit
+
+
+class Outbox:
+    """Queue of notifications to Telegram chats, sent in the background.
+
+    Notifications for a chat that arrive within `coalesce_window` seconds of each
+    other are joined into as few messages as possible, followed by a single sticker.
+    Each chat has its own token bucket of `rate` messages per second, and
+    `RetryAfter` errors are waited out before sending again. Sends that time out are
+    not retried, since Telegram may have delivered them. Queued notifications are
+    still sent for up to FLUSH_TIMEOUT seconds at exit.
+    """
+
+    def __init__(self, bot: Bot, rate: float = 20 / 60, capacity: float = 3, coalesce_window: float = 2):
+        self.bot = bot
+        self.rate = rate
+        self.capacity = capacity
+        self.coalesce_window = coalesce_window
+        self.buckets: dict[int, AsyncTokenBucket] = {}
+        self.pending: dict[int, list[tuple[str, Optional[str]]]] = {}
+        self.workers: dict[int, asyncio.Task] = {}
+
+    async def __aenter__(self) -> "Outbox":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        if not self.workers:
+            return
+        _, unfinished = await asyncio.wait(list(self.workers.values()), timeout=FLUSH_TIMEOUT)
+        for worker in unfinished:
+            worker.cancel()
+        if dropped := self.queued():
+            logger.warning(f"Dropped {dropped} queued notifications at exit")
+
+    def notify(self, chat_id: int, text: str, sticker: Optional[str] = None) -> None:
+        """Queue a message, optionally followed by a sticker. Never blocks."""
+        self.pending.setdefault(chat_id, []).append((text, sticker))
+        if chat_id not in self.workers:
+            self.workers[chat_id] = asyncio.create_task(self._work(chat_id))
+
+    def queued(self) -> int:
+        return sum(len(items) for items in self.pending.values())
+
+    async def _work(self, chat_id: int) -> None:
+        try:
+            while self.pending.get(chat_id):
+                await asyncio.sleep(self.coalesce_window)
+                items = self.pending.pop(chat_id)
+                for text in coalesce([text for text, _ in items]):
+                    await self._send(chat_id, lambda: self.bot.send_message(chat_id, text))
+
+                # One sticker per batch is enough, that of the latest notification
+                stickers = [sticker for _, sticker in items if sticker is not None]
+                if stickers:
+                    await self._send(chat_id, lambda: self.bot.send_sticker(chat_id, stickers[-1]))
+        finally:
+            del self.workers[chat_id]
+
+    async def _send(self, chat_id: int, call: Callable[[], Awaitable]) -> None:
+        bucket = self.buckets.setdefault(chat_id, AsyncTokenBucket(self.rate, self.capacity))
+        for attempt in range(MAX_ATTEMPTS):
+            await bucket.acquire()
+            try:
+                await call()
+                return
+            except RetryAfter as e:
+                logger.warning(f"Flood control in chat {chat_id}, retrying in {e.retry_after}s")
+                await asyncio.sleep(e.retry_after)
+            except TimedOut as e:
+                # The message may have been delivered, and a duplicate is worse than a missed one
+                logger.warning(f"Not resending to chat {chat_id} after {type(e).__name__}: {e!s}")
+                return
+            except NetworkError as e:
+                logger.warning(f"{type(e).__name__}: {e!s}")
+                await asyncio.sleep(2 ** attempt)
+            except TelegramError as e:
+                logger.error(f"Could not send to chat {chat_id}: {e!s}")
+                return
+        logger.error(f"Dropped a message to chat {chat_id} after {MAX_ATTEMPTS} attempts")
+
+
+def coalesce(texts: list[str]) -> list[str]:
+    """Join texts with blank lines into messages no longer than Telegram allows."""
+    messages = []
+    for text in texts:
+        if messages and len(messages[-1]) + 2 + len(text) <= MAX_MESSAGE_LENGTH:
+            messages[-1] += "\n\n" + text
+        else:
+            messages.append(text)
+    return messages
@@ -1,14 +1,22 @@
+import codecs
 from html.parser import HTMLParser
 from typing import Optional
 
-from aiocache import cached
 from aiohttp import web
 
+from tgbot.codeforces.cache import BoundedCache, cached
+
+cache = BoundedCache("cf_predictor", ttl=60, maxsize=16, max_bytes=1024 * 1024)
+
 
 class Parser(HTMLParser):
-    def __init__(self) -> None:
+    """Collects the rows of the given handles only. `done` is set once all of them are found."""
+
+    def __init__(self, handles: set[str]) -> None:
         super().__init__()
+        self.handles = handles
         self.parsing = False
+        self.done = not handles
         self.data = {}
         self.row = []
         self.content = ""
@@ -29,22 +37,36 @@ class Parser(HTMLParser):
         if tag == "td" and self.parsing:
             self.row.append(self.content.strip())
         elif tag == "tr" and self.parsing:
-            change = self.row[2]
-            if not change.startswith("-"):
-                change = f"+{change}"
-            self.data[self.row[1]] = (int(self.row[0]), self.row[1], change)
+            if self.row[1] in self.handles:
+                change = self.row[2]
+                if not change.startswith("-"):
+                    change = f"+{change}"
+                self.data[self.row[1]] = (int(self.row[0]), self.row[1], change)
+                self.done = len(self.data) == len(self.handles)
         elif tag == "tbody":
             self.parsing = False
+            self.done = True
 
 
-@cached(ttl=60)
-async def get_predicted_deltas(app: web.Application, contest_id: int) -> dict[str, tuple[int, str, int]]:
-    parser = Parser()
-    resp = await app["session"].get(
+@cached(cache, key=lambda app, contest_id, handles: (contest_id, handles))
+async def get_predicted_deltas(
+        app: web.Application,
+        contest_id: int,
+        handles: tuple[str, ...]
+) -> dict[str, tuple[int, str, str]]:
+    """Rows of cf-predictor's table for the given handles. Pass a sorted tuple so it is a stable cache key."""
+    parser = Parser(set(handles))
+    async with app["session"].get(
         "https://cf-predictor-frontend.herokuapp.com/roundResults.jsp",
         params={"contestId": contest_id}
-    )
-    async for data in resp.content.iter_chunked(32768):
-        parser.feed(data.decode())
+    ) as resp:
+        # Chunks can end in the middle of a multi-byte character
+        decoder = codecs.getincrementaldecoder(resp.charset or "utf-8")(errors="replace")
+        async for data in resp.content.iter_chunked(32768):
+            parser.feed(decoder.decode(data))
+            if parser.done:
+                break  # the rest of the page is not read
+        else:
+            parser.feed(decoder.decode(b"", final=True))
 
     return parser.data
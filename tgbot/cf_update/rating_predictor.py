@@ -0,0 +1,186 @@
+import logging
+import time
+from typing import Optional
+
+import numpy as np
+
+from tgbot.codeforces import AsyncCodeforcesAPI, CodeforcesError
+
+logger = logging.getLogger(__name__)
+
+# Binary search range of the rating needed for a rank, as in Codeforces' algorithm
+MIN_RATING = 1
+MAX_RATING = 8000
+NEW_USER_RATING = 1400  # internal rating of participants without a rated contest
+RATINGS_CHUNK_SIZE = 300  # handles per user.info request
+
+
+def win_probability(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Elo probability that a participant rated `a` places above one rated `b`."""
+    return 1 / (1 + 10 ** ((b - a) / 400))
+
+
+def trunc_div(a: int, b: int) -> int:
+    # Integer division as in Java, which the published algorithm is written in
+    q = abs(a) // abs(b)
+    return q if (a >= 0) == (b > 0) else -q
+
+
+class SeedTable:
+    """Expected rank `1 + sum(P(other beats R))` of a participant rated R, for every R in the search range.
+
+    Computed at once as the convolution of the rating histogram with the win
+    probability, so a lookup is an index instead of a sum over all participants.
+    """
+
+    def __init__(self, ratings: np.ndarray):
+        size = MAX_RATING - MIN_RATING + 1
+        hist = np.bincount(np.clip(ratings, MIN_RATING, MAX_RATING) - MIN_RATING, minlength=size)
+        diffs = np.arange(-(size - 1), size)
+        kernel = win_probability(np.zeros(1), diffs)  # P(other beats R) for R - other = diff
+
+        n = 1 << (len(hist) + len(kernel) - 2).bit_length()
+        conv = np.fft.irfft(np.fft.rfft(hist, n) * np.fft.rfft(kernel, n), n)
+        self.seeds = 1 + conv[size - 1:2 * size - 1]
+
+    def seed(self, ratings: np.ndarray) -> np.ndarray:
+        return self.seeds[np.clip(ratings, MIN_RATING, MAX_RATING) - MIN_RATING]
+
+    def rating_for_rank(self, ranks: np.ndarray) -> np.ndarray:
+        """Highest rating whose seed is at least each rank, by a vectorized binary search."""
+        left = np.full(len(ranks), MIN_RATING)
+        right = np.full(len(ranks), MAX_RATING)
+        while np.any(right - left > 1):
+            mid = (left + right) // 2
+            below = self.seed(mid) < ranks
+            right = np.where(below, mid, right)
+            left = np.where(below, left, mid)
+        return left
+
+
+def ranks_of(points: np.ndarray, penalties: np.ndarray) -> np.ndarray:
+    """Places of participants in standings order. Tied participants all take the lowest place of the tie."""
+    n = len(points)
+    last_of_tie = np.ones(n, dtype=bool)
+    last_of_tie[:-1] = (points[:-1] != points[1:]) | (penalties[:-1] != penalties[1:])
+    positions = np.arange(1, n + 1)
+    # Each participant's place is the position of the last participant of their tie
+    return np.minimum.accumulate(np.where(last_of_tie, positions, n + 1)[::-1])[::-1]
+
+
+def predict(ratings: np.ndarray, ranks: np.ndarray, table: Optional[SeedTable] = None) -> np.ndarray:
+    """Rating changes by Codeforces' algorithm (https://codeforces.com/blog/entry/20762)."""
+    n = len(ratings)
+    if n == 0:
+        return np.zeros(0, dtype=int)
+    table = table or SeedTable(ratings)
+
+    seeds = table.seed(ratings) - 0.5  # everyone but the participant themself
+    needed = table.rating_for_rank(np.sqrt(seeds * ranks))
+    deltas = np.trunc((needed - ratings) / 2).astype(int)
+
+    # The sum of all deltas should not be positive
+    deltas += trunc_div(-int(deltas.sum()), n) - 1
+
+    # The sum of deltas of the top rated participants should be about zero
+    top = min(4 * round(n ** 0.5), n)
+    top_sum = int(deltas[np.argsort(-ratings, kind="stable")[:top]].sum())
+    deltas += min(max(trunc_div(-top_sum, top), -10), 0)
+    return deltas
+
+
+class ContestPrediction:
+    def __init__(self, handles: list[str], ratings: np.ndarray, table: Optional[SeedTable] = None):
+        self.handles = handles
+        self.ratings = ratings
+        self.table = table or SeedTable(ratings)
+        self.standings_key: Optional[bytes] = None
+        self.places: dict[str, int] = {}
+        self.deltas: dict[str, int] = {}
+        self.updated = 0.0
+
+
+class RatingPredictor:
+    """Predicted rating changes of running and recently finished contests.
+
+    Participants and their ratings are fetched once per contest, together with
+    the seed table that depends only on them. Later updates only re-rank the
+    standings, and do nothing if the standings did not change.
+    """
+
+    def __init__(self, cf_client: AsyncCodeforcesAPI, ttl: float = 60, max_contests: int = 4):
+        self.cf_client = cf_client
+        self.ttl = ttl
+        self.max_contests = max_contests
+        self.contests: dict[int, ContestPrediction] = {}
+
+    async def get_ratings(self, handles: list[str]) -> np.ndarray:
+        ratings = await self.cf_client.get_rated_list()
+        missing = [h for h in handles if h not in ratings]
+        ratings = dict(ratings)  # the rated list is cached
+        for i in range(0, len(missing), RATINGS_CHUNK_SIZE):
+            ratings.update(await self.fetch_ratings(missing[i:i + RATINGS_CHUNK_SIZE]))
+        return np.array([ratings.get(h) or NEW_USER_RATING for h in handles])
+
+    async def fetch_ratings(self, handles: list[str]) -> dict[str, Optional[int]]:
+        """Ratings of the handles, without those Codeforces does not know.
+
+        One unknown handle fails the whole request, so a failed request is split
+        in halves until the unknown handles are singled out.
+        """
+        try:
+            return await self.cf_client.get_ratings(handles)
+        except CodeforcesError as e:
+            if str(e) != "Not found":
+                raise e from None
+        if len(handles) == 1:
+            logger.warning(f"Could not get the rating of {handles[0]}")
+            return {}
+        mid = len(handles) // 2
+        return {**await self.fetch_ratings(handles[:mid]), **await self.fetch_ratings(handles[mid:])}
+
+    async def update(self, contest_id: int) -> ContestPrediction:
+        _, rows = await self.cf_client.get_standings(contest_id, None)
+        rows = [r for r in rows if r["party"]["participantType"] == "CONTESTANT" and len(r["party"]["members"]) == 1]
+        handles = [r["party"]["members"][0]["handle"] for r in rows]
+
+        prediction = self.contests.get(contest_id)
+        if prediction is None or set(prediction.handles) != set(handles):
+            prediction = ContestPrediction(handles, await self.get_ratings(handles))
+            self.contests[contest_id] = prediction
+            while len(self.contests) > self.max_contests:
+                del self.contests[next(iter(self.contests))]
+        elif prediction.handles != handles:
+            # Same participants in a new order, e.g. after system tests; the seed table still holds
+            old = dict(zip(prediction.handles, prediction.ratings.tolist()))
+            prediction.handles = handles
+            prediction.ratings = np.array([old[h] for h in handles])
+            prediction.standings_key = None
+
+        points = np.array([r["points"] for r in rows], dtype=float)
+        penalties = np.array([r.get("penalty", 0) for r in rows])
+        key = points.tobytes() + penalties.tobytes()
+        if key != prediction.standings_key:
+            start = time.perf_counter()
+            deltas = predict(prediction.ratings, ranks_of(points, penalties), prediction.table)
+            prediction.deltas = dict(zip(handles, deltas.tolist()))
+            prediction.places = {h: r["rank"] for h, r in zip(handles, rows)}
+            prediction.standings_key = key
+            logger.info(f"Predicted {len(handles)} rating changes of contest {contest_id} "
+                        f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+        prediction.updated = time.monotonic()
+        return prediction
+
+    async def get_predicted_deltas(self, contest_id: int, handles: list[str]) -> dict[str, tuple[int, str, str]]:
+        """Table rows (place, handle, delta) of the given handles."""
+        prediction = self.contests.get(contest_id)
+        if prediction is None or time.monotonic() - prediction.updated > self.ttl:
+            prediction = await self.update(contest_id)
+        return {
+            h: (prediction.places[h], h, f"{prediction.deltas[h]:+d}")
+            for h in handles if h in prediction.deltas
+        }
+
+    def forget(self, contest_id: int) -> None:
+        self.contests.pop(contest_id, None)
+
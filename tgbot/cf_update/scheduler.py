@@ -0,0 +1,129 @@
+import asyncio
+import heapq
+from typing import Any, Optional
+
+
+class PollScheduler:
+    """Priority queue of handles ordered by when they are next due for polling.
+
+    Active handles are polled every `min_interval` seconds. Each poll that finds
+    a handle idle doubles its interval (times `backoff`), up to `max_interval`.
+    Handles in `covered` are watched by other means that poke them on changes,
+    so they are polled at most every `covered_interval` seconds while active.
+    """
+
+    def __init__(
+            self,
+            min_interval: float = 5,
+            max_interval: float = 10 * 60,
+            backoff: float = 2,
+            covered_interval: float = 60
+    ):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.covered_interval = covered_interval
+        self.covered: set[str] = set()
+
+        self.heap: list[tuple[float, str]] = []
+        self.due: dict[str, float] = {}  # handles waiting in the heap
+        self.in_flight: set[str] = set()
+        self.poked: set[str] = set()
+        self.intervals: dict[str, float] = {}
+        self.last_polled: dict[str, float] = {}
+        self.last_success: dict[str, float] = {}
+        self.lags: dict[str, float] = {}
+        self.changed = asyncio.Event()
+
+    @staticmethod
+    def now() -> float:
+        return asyncio.get_running_loop().time()
+
+    def _schedule(self, handle: str, at: float) -> None:
+        self.due[handle] = at
+        heapq.heappush(self.heap, (at, handle))
+        self.changed.set()
+
+    def sync(self, handles: list[str]) -> None:
+        """Start scheduling new handles and drop absent ones."""
+        handles = set(handles)
+        for handle in list(self.intervals):
+            if handle not in handles:
+                del self.intervals[handle]
+                self.due.pop(handle, None)  # stale heap entries are skipped in next()
+                self.last_polled.pop(handle, None)
+                self.last_success.pop(handle, None)
+                self.lags.pop(handle, None)
+        for handle in handles:
+            if handle not in self.intervals:
+                self.intervals[handle] = self.min_interval
+                self._schedule(handle, self.now())
+
+    def poke(self, handle: str) -> None:
+        """Poll a handle as soon as possible and treat it as active."""
+        if handle not in self.intervals:
+            return
+        self.intervals[handle] = self.min_interval
+        if handle in self.in_flight:
+            self.poked.add(handle)
+        elif self.due.get(handle, 0) > self.now():
+            self._schedule(handle, self.now())
+
+    async def next(self) -> str:
+        while True:
+            while self.heap and self.due.get(self.heap[0][1]) != self.heap[0][0]:
+                heapq.heappop(self.heap)  # removed or rescheduled
+
+            self.changed.clear()
+            timeout = self.heap[0][0] - self.now() if self.heap else None
+            if timeout is not None and timeout <= 0:
+                at, handle = heapq.heappop(self.heap)
+                del self.due[handle]
+                self.in_flight.add(handle)
+                self.lags[handle] = self.now() - at
+                return handle
+
+            try:
+                await asyncio.wait_for(self.changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def report(self, handle: str, active: Optional[bool]) -> None:
+        """Reschedule a polled handle. `active` is None if the poll failed."""
+        self.in_flight.discard(handle)
+        if handle not in self.intervals:
+            return
+
+        now = self.now()
+        self.last_polled[handle] = now
+        if active is not None:
+            self.last_success[handle] = now
+        if handle in self.poked:
+            self.poked.remove(handle)
+            active = True
+        if active:
+            self.intervals[handle] = self.min_interval
+            if handle in self.covered:
+                self.intervals[handle] = max(self.min_interval, self.covered_interval)
+        elif active is not None:
+            self.intervals[handle] = min(self.intervals[handle] * self.backoff, self.max_interval)
+        self._schedule(handle, now + self.intervals[handle])
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        now = self.now()
+        return {
+            handle: {
+                "interval": interval,
+                "lag": self.lags.get(handle),
+                "since_last_poll": now - self.last_polled[handle] if handle in self.last_polled else None,
+                "since_last_success": now - self.last_success[handle] if handle in self.last_success else None
+            }
+            for handle, interval in self.intervals.items()
+        }
+
+    def queue_stats(self) -> dict[str, int]:
+        now = self.now()
+        return {
+            "overdue_polls": sum(at <= now for at in self.due.values()),
+            "polls_in_flight": len(self.in_flight)
+        }
@@ -0,0 +1,152 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from tgbot.cf_update.sync import Fingerprint, SyncState
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS handles (
+    handle TEXT PRIMARY KEY,
+    max_final_id INTEGER NOT NULL,
+    pending_depth INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS submissions (
+    handle TEXT NOT NULL REFERENCES handles (handle) ON DELETE CASCADE,
+    id INTEGER NOT NULL,
+    verdict TEXT,
+    testset TEXT NOT NULL,
+    passed_test_count INTEGER NOT NULL,
+    creation_time INTEGER NOT NULL,
+    contest_id INTEGER,
+    participant_type TEXT NOT NULL,
+    PRIMARY KEY (handle, id)
+) WITHOUT ROWID;
+"""
+
+
+class SubmissionStore:
+    """SQLite store of each member's SyncState.
+
+    All database access runs on one worker thread, off the event loop. States are
+    mirrored in memory, so reads are free and writes only touch rows that changed.
+    """
+
+    def __init__(self, path: str = "cf_update.sqlite3", tinydb_path: Optional[str] = "db.json"):
+        self.path = path
+        self.tinydb_path = tinydb_path
+        self.conn: Optional[sqlite3.Connection] = None
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.states: dict[str, SyncState] = {}
+
+    async def __aenter__(self) -> "SubmissionStore":
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        await self._run(self._open)
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self._run(self.conn.close)
+        self.executor.shutdown()
+
+    async def _run(self, func: Callable, *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    def _open(self) -> None:
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.executescript(SCHEMA)
+
+        for handle, max_final_id, pending_depth in self.conn.execute("SELECT * FROM handles"):
+            self.states[handle] = SyncState(max_final_id, pending_depth=pending_depth)
+        for handle, *fields in self.conn.execute("SELECT * FROM submissions"):
+            fingerprint = Fingerprint(*fields)
+            self.states[handle].pending[fingerprint.id] = fingerprint
+
+        if not self.states and self.tinydb_path and os.path.exists(self.tinydb_path):
+            self._migrate_tinydb()
+
+    def _migrate_tinydb(self) -> None:
+        with open(self.tinydb_path) as f:
+            documents = json.load(f).get("_default", {}).values()
+
+        for doc in documents:
+            # Contests are not looked up here, so contest submissions stay pending until the first poll
+            state = SyncState.from_submissions(doc["status"], finished_contest_ids=())
+            self._insert(doc["handle"], state)
+            self.states[doc["handle"]] = state
+
+        os.replace(self.tinydb_path, f"{self.tinydb_path}.migrated")
+        logger.info(f"Migrated {len(self.states)} handles from {self.tinydb_path}")
+
+    def _insert(self, handle: str, state: SyncState) -> None:
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO handles VALUES (?, ?, ?)", (handle, state.max_final_id, state.pending_depth)
+            )
+            self.conn.executemany(
+                "INSERT INTO submissions VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(handle, *fingerprint) for fingerprint in state.pending.values()]
+            )
+
+    def _delete(self, handles: list[str]) -> None:
+        with self.conn:
+            self.conn.executemany("DELETE FROM handles WHERE handle = ?", [(h,) for h in handles])
+
+    def _update(
+            self,
+            handle: str,
+            watermark: Optional[tuple[int, int]],
+            upserts: list[Fingerprint],
+            deletes: list[int]
+    ) -> None:
+        with self.conn:
+            if watermark is not None:
+                self.conn.execute(
+                    "UPDATE handles SET max_final_id = ?, pending_depth = ? WHERE handle = ?", (*watermark, handle)
+                )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO submissions VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(handle, *fingerprint) for fingerprint in upserts]
+            )
+            self.conn.executemany(
+                "DELETE FROM submissions WHERE handle = ? AND id = ?",
+                [(handle, sid) for sid in deletes]
+            )
+
+    def handles(self) -> list[str]:
+        return list(self.states)
+
+    def get_state(self, handle: str) -> SyncState:
+        state = self.states[handle]
+        return SyncState(state.max_final_id, dict(state.pending), state.pending_depth)
+
+    async def add_handle(self, handle: str, state: SyncState) -> None:
+        self.states[handle] = state
+        await self._run(self._insert, handle, state)
+
+    async def remove_handles(self, handles: list[str]) -> None:
+        for handle in handles:
+            self.states.pop(handle, None)
+        await self._run(self._delete, handles)
+
+    async def save_state(self, handle: str, state: SyncState) -> None:
+        """Write the difference between the stored state of a handle and `state`."""
+        if (old := self.states.get(handle)) is None:
+            return  # removed while being polled
+
+        upserts = [f for sid, f in state.pending.items() if old.pending.get(sid) != f]
+        deletes = [sid for sid in old.pending if sid not in state.pending]
+        watermark = (state.max_final_id, state.pending_depth)
+        if watermark == (old.max_final_id, old.pending_depth):
+            watermark = None
+
+        self.states[handle] = state
+        if upserts or deletes or watermark is not None:
+            await self._run(self._update, handle, watermark, upserts, deletes)
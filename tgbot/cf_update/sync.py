@@ -0,0 +1,172 @@
+import logging
+from typing import Any, Collection, NamedTuple, Optional
+
+from tgbot.codeforces import AsyncCodeforcesAPI, CodeforcesError, CodeforcesUnavailableError, ContestPhase
+from tgbot.codeforces.decoders import CompactSubmission, decode_status
+
+INITIAL_PAGE_SIZE = 10
+MAX_SYNC_DEPTH = 100  # older submissions are never looked at again
+
+logger = logging.getLogger(__name__)
+
+
+class Fingerprint(NamedTuple):
+    """What is kept of a pending submission between polls.
+
+    `key` holds the fields compared by `Submission.__eq__`; the rest decide whether
+    the submission is final and whether its author is active.
+    """
+    id: int
+    verdict: Optional[str]
+    testset: str
+    passedTestCount: int
+    creationTimeSeconds: int
+    contestId: Optional[int]
+    participantType: str
+
+    @property
+    def key(self) -> tuple[int, Optional[str], str, int]:
+        return self[:4]
+
+    @classmethod
+    def of(cls, submission: dict[str, Any]) -> "Fingerprint":
+        return cls(
+            submission["id"],
+            submission.get("verdict"),
+            submission["testset"],
+            submission["passedTestCount"],
+            submission["creationTimeSeconds"],
+            submission.get("contestId"),
+            submission["author"]["participantType"]
+        )
+
+
+def fingerprint_key(submission: dict[str, Any]) -> tuple[int, Optional[str], str, int]:
+    return submission["id"], submission.get("verdict"), submission["testset"], submission["passedTestCount"]
+
+
+def is_contest_submission(submission: dict[str, Any]) -> bool:
+    """Whether a submission can still fail system tests or be hacked until its contest is finished."""
+    return (
+        submission["author"]["participantType"] in ("CONTESTANT", "OUT_OF_COMPETITION")
+        and submission.get("contestId") is not None
+    )
+
+
+def is_final(submission: dict[str, Any], finished_contest_ids: Collection[int]) -> bool:
+    """Whether a submission's verdict can no longer change (or we don't care if it does)."""
+    if submission["author"].get("teamId") is not None or submission["problem"].get("problemsetName") is not None:
+        return True  # never announced
+    if submission.get("verdict") in (None, "TESTING"):
+        return False
+    return not is_contest_submission(submission) or submission["contestId"] in finished_contest_ids
+
+
+async def get_finished_contest_ids(cf_client: AsyncCodeforcesAPI, submissions: list[dict[str, Any]]) -> set[int]:
+    """The contests of contest submissions among `submissions` that are confirmed finished.
+
+    A finished contest stays finished, so a stale contest list can only be late to
+    show it. Contests missing from the list, such as gym contests or rounds newer
+    than the cached list, are looked up one by one.
+    """
+    contest_ids = {s["contestId"] for s in submissions if is_contest_submission(s)}
+    if not contest_ids:
+        return set()
+
+    phases = {c.id: c.phase for c in await cf_client.get_contests(phases=())}
+    for contest_id in contest_ids - phases.keys():
+        try:
+            phases[contest_id] = (await cf_client.get_contest(contest_id)).phase
+        except CodeforcesUnavailableError:
+            raise
+        except CodeforcesError as e:
+            # e.g. a private gym, which could never be confirmed finished
+            logger.warning(f"Contest {contest_id}: {type(e).__name__}: {e!s}")
+            phases[contest_id] = ContestPhase.FINISHED
+    return {cid for cid in contest_ids if phases[cid] == ContestPhase.FINISHED}
+
+
+class SyncState:
+    """Watermark of a member's submissions: the highest final submission id and all newer or non-final ones.
+
+    `pending_depth` is how many of the newest submissions had to be read to reach the oldest pending one.
+    """
+
+    def __init__(
+            self,
+            max_final_id: int = 0,
+            pending: Optional[dict[int, Fingerprint]] = None,
+            pending_depth: int = 0
+    ):
+        self.max_final_id = max_final_id
+        self.pending = pending or {}
+        self.pending_depth = pending_depth
+
+    @classmethod
+    def from_submissions(cls, submissions: list[dict[str, Any]], finished_contest_ids: Collection[int]) -> "SyncState":
+        state = cls()
+        state.advance(submissions, finished_contest_ids)
+        return state
+
+    def has_seen(self, submissions: list[dict[str, Any]]) -> bool:
+        """Whether `submissions` reach back to one that was seen, so that nothing older is new."""
+        return any(s["id"] <= self.max_final_id or s["id"] in self.pending for s in submissions)
+
+    def unsettled(self, submissions: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """The submissions that are new or still pending."""
+        return [s for s in submissions if s["id"] > self.max_final_id or s["id"] in self.pending]
+
+    def missing_rows(self, submissions: list[dict[str, Any]]) -> int:
+        """How many more submissions must be read after the newest `submissions` to reach the oldest pending one."""
+        if not self.pending or not submissions or submissions[-1]["id"] <= min(self.pending):
+            return 0
+        newest_seen = max(self.max_final_id, *self.pending)
+        unseen = sum(s["id"] > newest_seen for s in submissions)
+        return max(self.pending_depth + unseen - len(submissions), 1)
+
+    def updates(self, submissions: list[dict[str, Any]]) -> list[CompactSubmission]:
+        """New submissions and pending submissions whose verdict changed, newest first."""
+        updated = []
+        for submission in submissions:
+            if (pending := self.pending.get(submission["id"])) is not None:
+                if pending.key == fingerprint_key(submission):
+                    continue
+            elif submission["id"] <= self.max_final_id:
+                continue
+            updated.append(submission)
+        return decode_status(updated)
+
+    def advance(self, submissions: list[dict[str, Any]], finished_contest_ids: Collection[int]) -> None:
+        """Record the newest submissions. Pending submissions older than those are forgotten."""
+        watermark, pending = self.max_final_id, self.pending
+        self.pending = {}
+        self.pending_depth = 0
+        for depth, submission in enumerate(submissions, 1):
+            settled = submission["id"] <= watermark and submission["id"] not in pending
+            if settled or is_final(submission, finished_contest_ids):
+                self.max_final_id = max(self.max_final_id, submission["id"])
+            else:
+                self.pending[submission["id"]] = Fingerprint.of(submission)
+                self.pending_depth = depth
+
+
+async def fetch_unsynced(cf_client: AsyncCodeforcesAPI, handle: str, state: SyncState) -> list[dict[str, Any]]:
+    """Fetch the newest submissions: every unseen one, then the pending ones below them.
+
+    The page is widened only while it holds no submission seen before. Pending
+    submissions further down are then read with a single request.
+    """
+    submissions = []
+    count = INITIAL_PAGE_SIZE
+    while True:
+        page = await cf_client.get_raw_status(handle, count=count, start=len(submissions) + 1)
+        submissions += page
+        if len(page) < count or len(submissions) >= MAX_SYNC_DEPTH:
+            return submissions
+        if state.has_seen(page):
+            break
+        count = min(count * 2, MAX_SYNC_DEPTH - len(submissions))
+
+    if missing := min(state.missing_rows(submissions), MAX_SYNC_DEPTH - len(submissions)):
+        submissions += await cf_client.get_raw_status(handle, count=missing, start=len(submissions) + 1)
+    return submissions
@@ -1,3 +1,3 @@
 from tgbot.clist.async_client import AsyncClistAPI
 from tgbot.clist.client import ClistAPI
-from tgbot.clist.models import ClistError
+from tgbot.clist.models import ClistError, ClistUnavailableError
@@ -1,43 +1,62 @@
+import asyncio
 import logging
 from datetime import timedelta
-from typing import Any, Optional
+from typing import Any, Callable, Optional
 
-from aiohttp import ClientSession
+import orjson
+from aiohttp import ClientError, ClientSession, ClientTimeout
 
-from tgbot.clist.models import ClistError, ContestInfo
+from tgbot.clist.models import ClistUnavailableError, ContestInfo
+from tgbot.metrics import track
+from tgbot.resilience import CircuitBreaker, Resilience, RetryPolicy
 from tgbot.utils import RESOURCES, hkt_now
 
 logger = logging.getLogger(__name__)
 
 
 class AsyncClistAPI:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, timeout: float = 5, json_loads: Callable[[bytes], Any] = orjson.loads):
         self.base_url = "https://clist.by/api/v2"
         self.session: Optional[ClientSession] = None
         self.api_key = api_key
+        self.timeout = timeout
+        self.json_loads = json_loads
+        self.resilience = Resilience(
+            CircuitBreaker("clist"),
+            RetryPolicy(),
+            transient=(ClistUnavailableError, ClientError, asyncio.TimeoutError),
+            unavailable=ClistUnavailableError
+        )
 
     async def __aenter__(self) -> "AsyncClistAPI":
-        self.session = ClientSession(headers={"Authorization": f"ApiKey {self.api_key}"})
+        self.session = ClientSession(
+            headers={"Authorization": f"ApiKey {self.api_key}"},
+            timeout=ClientTimeout(total=self.timeout)
+        )
         return self
 
     async def __aexit__(self, *args) -> None:
         await self.session.close()
 
-    async def _request(self, endpoint, *args, **kwargs) -> Any:
-        resp = await self.session.get(f"{self.base_url}/{endpoint}", *args, **kwargs)
-        text = await resp.text()
+    async def _request(self, endpoint: str, params: Optional[dict[str, Any]] = None) -> Any:
+        return await self.resilience.acall(lambda: self._fetch(endpoint, params))
 
-        if resp.content_type != "application/json":
-            raise ClistError("Clist sent non-JSON response:\n{text}")
+    async def _fetch(self, endpoint: str, params: Optional[dict[str, Any]]) -> Any:
+        with track("clist", endpoint):
+            resp = await self.session.get(f"{self.base_url}/{endpoint}", params=params)
+            body = await resp.read()
 
-        try:
-            data = await resp.json()
-        except Exception as e:
-            logger.error("Could not read JSON from response:")
-            logger.error(text)
-            raise e from None
+            if resp.content_type != "application/json":
+                raise ClistUnavailableError("Clist sent non-JSON response:\n{text}")
 
-        return data["objects"]
+            try:
+                data = self.json_loads(body)
+            except Exception as e:
+                logger.error("Could not read JSON from response:")
+                logger.error(body.decode(resp.charset or "utf-8", errors="replace"))
+                raise e from None
+
+            return data["objects"]
 
     async def get_upcoming_contests(self) -> list[ContestInfo]:
         data = await self._request("contest", params={
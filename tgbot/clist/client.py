@@ -1,34 +1,49 @@
 import logging
 from datetime import timedelta
+from typing import Any, Callable, Optional
 
+import orjson
 import requests
 
-from tgbot.clist.models import ClistError, ContestInfo
+from tgbot.clist.models import ClistUnavailableError, ContestInfo
+from tgbot.metrics import track
+from tgbot.resilience import CircuitBreaker, Resilience, RetryPolicy
 from tgbot.utils import RESOURCES, hkt_now
 
 logger = logging.getLogger(__name__)
 
 
 class ClistAPI:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, json_loads: Callable[[bytes], Any] = orjson.loads):
         self.base_url = "https://clist.by/api/v2"
         self.session = requests.Session()
+        self.json_loads = json_loads
         self.session.headers = {"Authorization": f"ApiKey {api_key}"}
-
-    def _request(self, endpoint, *args, **kwargs):
-        resp = self.session.get(f"{self.base_url}/{endpoint}", *args, timeout=5, **kwargs)
-
-        if "application/json" not in resp.headers["Content-Type"]:
-            raise ClistError("Clist sent non-JSON response:\n{text}")
-
-        try:
-            data = resp.json()
-        except Exception as e:
-            logger.error("Could not read JSON from response")
-            logger.error(resp.text)
-            raise e from None
-
-        return data["objects"]
+        self.resilience = Resilience(
+            CircuitBreaker("clist"),
+            RetryPolicy(attempts=2),
+            transient=(ClistUnavailableError, requests.ConnectionError, requests.Timeout),
+            unavailable=ClistUnavailableError
+        )
+
+    def _request(self, endpoint: str, params: Optional[dict[str, Any]] = None) -> Any:
+        return self.resilience.call(lambda: self._fetch(endpoint, params))
+
+    def _fetch(self, endpoint: str, params: Optional[dict[str, Any]]) -> Any:
+        with track("clist", endpoint):
+            resp = self.session.get(f"{self.base_url}/{endpoint}", params=params, timeout=5)
+
+            if "application/json" not in resp.headers["Content-Type"]:
+                raise ClistUnavailableError("Clist sent non-JSON response:\n{text}")
+
+            try:
+                data = self.json_loads(resp.content)
+            except Exception as e:
+                logger.error("Could not read JSON from response")
+                logger.error(resp.text)
+                raise e from None
+
+            return data["objects"]
 
     def get_upcoming_contests(self) -> list[ContestInfo]:
         data = self._request("contest", params={
@@ -9,6 +9,13 @@ class ClistError(Exception):
     pass
 
 
+class ClistUnavailableError(ClistError):
+    """Clist is down or did not answer in time."""
+
+    def __init__(self, message: str = "Clist is temporarily unavailable.") -> None:
+        super().__init__(message)
+
+
 class ContestInfo(BaseModel):
     event: str
     href: str
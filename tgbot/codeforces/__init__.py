@@ -1,3 +1,5 @@
 from tgbot.codeforces.async_client import AsyncCodeforcesAPI
 from tgbot.codeforces.client import CodeforcesAPI
 from tgbot.codeforces.models import *
+from tgbot.codeforces.problem_index import ProblemIndex
+from tgbot.codeforces.snapshot import ProblemsetSnapshot
@@ -1,70 +1,145 @@
+import asyncio
 import logging
-from typing import Any, Optional
+from typing import Any, Callable, Optional
 
-from aiocache import cached
-from aiohttp import ClientSession
+import orjson
+from aiohttp import ClientError, ClientSession, ClientTimeout
 
-from tgbot.codeforces.models import CodeforcesError, Contest, ContestPhase, RatingChange, Submission, User
+from tgbot.codeforces.cache import BoundedCache, cachedmethod, record_payload
+from tgbot.codeforces.decoders import (
+    CompactContest, CompactRatingChange, CompactSubmission, decode_contests, decode_rating_changes, decode_status
+)
+from tgbot.codeforces.models import CodeforcesError, CodeforcesUnavailableError, Contest, ContestPhase, User
+from tgbot.metrics import track
+from tgbot.rate_limit import AsyncTokenBucket
+from tgbot.resilience import CircuitBreaker, Resilience, RetryPolicy
+from tgbot.single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
 
 class AsyncCodeforcesAPI:
-    def __init__(self):
+    def __init__(
+            self,
+            rate_limiter: Optional[AsyncTokenBucket] = None,
+            timeout: float = 10,
+            json_loads: Callable[[bytes], Any] = orjson.loads
+    ):
         self.base_url = "https://codeforces.com/api"
         self.session: Optional[ClientSession] = None
+        self.timeout = timeout
+        self.json_loads = json_loads
+        self.rate_limiter = rate_limiter
+        self.single_flight = SingleFlight()
+        self.resilience = Resilience(
+            CircuitBreaker("codeforces"),
+            RetryPolicy(),
+            transient=(CodeforcesUnavailableError, ClientError, asyncio.TimeoutError),
+            unavailable=CodeforcesUnavailableError
+        )
+
+        self.users_cache = BoundedCache("users", ttl=60, max_bytes=4 * 1024 * 1024)
+        self.contest_cache = BoundedCache("contest", ttl=5 * 60, maxsize=256, max_bytes=1024 * 1024)
+        self.contests_cache = BoundedCache("contests", ttl=5 * 60, max_stale=60 * 60, maxsize=8)
+        self.rated_list_cache = BoundedCache("rated_list", ttl=24 * 60 * 60, maxsize=2, max_bytes=64 * 1024 * 1024)
+        self.rating_changes_cache = BoundedCache("rating_changes", ttl=60, maxsize=8, max_bytes=32 * 1024 * 1024)
 
     async def __aenter__(self) -> "AsyncCodeforcesAPI":
-        self.session = ClientSession()
+        self.session = ClientSession(timeout=ClientTimeout(total=self.timeout))
         return self
 
     async def __aexit__(self, *args) -> None:
         await self.session.close()
 
-    async def _request(self, endpoint, *args, **kwargs) -> Any:
-        resp = await self.session.get(f"{self.base_url}/{endpoint}", *args, **kwargs)
-        text = await resp.text()
-
-        if "Codeforces is temporarily unavailable." in text:
-            raise CodeforcesError("Codeforces is temporarily unavailable.")
-        if "504 Gateway Time-out" in text and resp.content_type == "text/html":
-            raise CodeforcesError("504 Gateway Timeout")
-        if resp.content_type != "application/json":
-            raise CodeforcesError("Codeforces sent non-JSON response:\n{text}")
-
-        try:
-            data = await resp.json()
-        except Exception as e:
-            logger.error("Could not read JSON from response:")
-            logger.error(text)
-            raise e from None
-
-        if data["status"] == "FAILED":
-            if "not found" in data["comment"].lower():
-                raise CodeforcesError("Not found")
-            else:
-                raise CodeforcesError(data["comment"])
-        return data["result"]
+    async def _request(self, endpoint: str, params: Optional[dict[str, Any]] = None) -> Any:
+        # Identical concurrent requests share one HTTP request and one parse
+        key = (endpoint, *sorted((params or {}).items()))
+        return await self.single_flight.ado(
+            key, lambda: self.resilience.acall(lambda: self._fetch(endpoint, params))
+        )
+
+    async def _fetch(self, endpoint: str, params: Optional[dict[str, Any]]) -> Any:
+        if self.rate_limiter:
+            await self.rate_limiter.acquire()
+        with track("codeforces", endpoint):
+            resp = await self.session.get(f"{self.base_url}/{endpoint}", params=params)
+            body = await resp.read()
+
+            # The body is decoded to text only to tell error pages apart
+            if resp.content_type != "application/json":
+                text = body.decode(resp.charset or "utf-8", errors="replace")
+                if "Codeforces is temporarily unavailable." in text:
+                    raise CodeforcesUnavailableError()
+                if "504 Gateway Time-out" in text and resp.content_type == "text/html":
+                    raise CodeforcesUnavailableError("504 Gateway Timeout")
+                raise CodeforcesUnavailableError("Codeforces sent non-JSON response:\n{text}")
+
+            try:
+                data = self.json_loads(body)
+                record_payload(len(body))
+            except Exception as e:
+                logger.error("Could not read JSON from response:")
+                logger.error(body.decode(resp.charset or "utf-8", errors="replace"))
+                raise e from None
+
+            if data["status"] == "FAILED":
+                if "not found" in data["comment"].lower():
+                    raise CodeforcesError("Not found")
+                else:
+                    raise CodeforcesError(data["comment"])
+            return data["result"]
 
     async def get_user(self, handle: str) -> User:
         users = await self.get_users(handle)
         return users[0]
 
-    @cached(ttl=60)
+    @cachedmethod(lambda self: self.users_cache)
     async def get_users(self, *handles: str) -> list[User]:
         data = await self._request("user.info", params={"handles": ";".join(handles)})
         return [User(**u) for u in data]
 
-    async def get_status(self, handle: str, count: Optional[int] = None) -> list[Submission]:
+    async def get_raw_status(
+            self,
+            handle: str,
+            count: Optional[int] = None,
+            start: Optional[int] = None
+    ) -> list[dict[str, Any]]:
+        """Undecoded submissions, newest first. `start` is the 1-based index of the first one."""
         params = {"handle": handle}
         if count is not None:
             params["count"] = count
-        data = await self._request("user.status", params=params)
-        status = [Submission(**s) for s in data]
-        status = [s for s in status if s.author.not_team() and s.problem.problemsetName is None]
-        return status
+        if start is not None:
+            params["from"] = start
+        return await self._request("user.status", params=params)
+
+    async def get_status(self, handle: str, count: Optional[int] = None) -> list[CompactSubmission]:
+        data = await self.get_raw_status(handle, count)
+        return decode_status(data)
+
+    async def get_standings(
+            self,
+            contest_id: int,
+            handles: Optional[list[str]],
+            show_unofficial: bool = False
+    ) -> tuple[Contest, list[dict[str, Any]]]:
+        """The contest and the undecoded ranklist rows of the given handles, or of everyone if None."""
+        params = {"contestId": contest_id, "showUnofficial": str(show_unofficial).lower()}
+        if handles is not None:
+            params["handles"] = ";".join(handles)
+        data = await self._request("contest.standings", params=params)
+        return Contest(**data["contest"]), data["rows"]
+
+    async def get_ratings(self, handles: list[str]) -> dict[str, Optional[int]]:
+        """Current ratings of the given handles, None for unrated users."""
+        data = await self._request("user.info", params={"handles": ";".join(handles)})
+        return {u["handle"]: u.get("rating") for u in data}
+
+    @cachedmethod(lambda self: self.rated_list_cache)
+    async def get_rated_list(self, active_only: bool = True) -> dict[str, int]:
+        data = await self._request("user.ratedList", params={"activeOnly": str(active_only).lower()})
+        return {u["handle"]: u["rating"] for u in data}
 
-    @cached(ttl=5 * 60)
+    @cachedmethod(lambda self: self.contest_cache)
     async def get_contest(self, contest_id: int) -> Contest:
         # Assumes contest has already started
         data = await self._request(
@@ -73,21 +148,30 @@ class AsyncCodeforcesAPI:
         )
         return Contest(**data["contest"])
 
-    @cached(ttl=5 * 60)
+    @cachedmethod(lambda self: self.contests_cache)
     async def get_contests(
             self,
             phases: tuple[ContestPhase] = (ContestPhase.BEFORE, ContestPhase.CODING)
-    ) -> list[Contest]:
+    ) -> list[CompactContest]:
         data = await self._request("contest.list", params={"gym": "false"})
-        contests = [Contest(**c) for c in data]
-        if phases:
-            contests = [c for c in contests if c.phase in phases]
+        contests = decode_contests(data, phases)
         contests.sort(key=lambda c: c.startTimeSeconds)
         return contests
 
-    @cached(ttl=60)
-    async def get_rating_changes(self, contest_id: int) -> dict[str, RatingChange]:
+    @cachedmethod(lambda self: self.rating_changes_cache)
+    async def get_rating_changes(self, contest_id: int) -> dict[str, CompactRatingChange]:
         data = await self._request("contest.ratingChanges", params={"contestId": contest_id})
-        rating_changes = [RatingChange(**rc) for rc in data]
-        rc_dict = {rc.handle: rc for rc in rating_changes}
-        return rc_dict
+        return decode_rating_changes(data)
+
+    def request_stats(self) -> dict[str, dict[str, int]]:
+        """Requests sent and identical requests coalesced into them, per endpoint."""
+        return self.single_flight.stats()
+
+    def cache_stats(self) -> dict[str, dict[str, Any]]:
+        return {
+            cache.name: cache.stats()
+            for cache in (
+                self.users_cache, self.contest_cache, self.contests_cache, self.rated_list_cache,
+                self.rating_changes_cache
+            )
+        }
@@ -0,0 +1,316 @@
+import asyncio
+import functools
+import inspect
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Hashable, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# Byte lengths of the responses read while fetching a value for a cache
+payload_sizes: ContextVar[Optional[list[int]]] = ContextVar("payload_sizes", default=None)
+
+
+def record_payload(size: int) -> None:
+    """Count a response of `size` bytes towards the size of the value being fetched, if any."""
+    if (sizes := payload_sizes.get()) is not None:
+        sizes.append(size)
+
+
+def approx_size(obj: Any) -> int:
+    """Approximate memory held by `obj`, following containers and object attributes."""
+    seen = set()
+    size = 0
+    stack = [obj]
+    while stack:
+        o = stack.pop()
+        if id(o) in seen:
+            continue
+        seen.add(id(o))
+        size += sys.getsizeof(o)
+        if isinstance(o, (str, bytes, int, float, bool)) or o is None:
+            continue
+        if isinstance(o, dict):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset)):
+            stack.extend(o)
+        else:
+            if hasattr(o, "__dict__"):
+                stack.append(vars(o))
+            for cls in type(o).__mro__:
+                for slot in getattr(cls, "__slots__", ()):
+                    if hasattr(o, slot):
+                        stack.append(getattr(o, slot))
+    return size
+
+
+class Entry(NamedTuple):
+    value: Any
+    fetched_at: float
+    size: int
+
+
+class BoundedCache:
+    """LRU cache with a TTL and a byte budget, shared by the sync and async clients.
+
+    Values younger than `ttl` are served as is. Older values are still served, and
+    a background refresh is started, until they are `max_stale` seconds old; after
+    that the caller waits for a fresh value (and sees the error if the fetch fails).
+    By default `max_stale` equals `ttl`, which disables refresh-ahead.
+
+    Least recently used entries are evicted when there are more than `maxsize` of
+    them or their approximate sizes add up to more than `max_bytes`. The size of a
+    value is the byte length of the responses it was decoded from, as reported by
+    the clients with `record_payload`, or else `sizer(value)`.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            ttl: float,
+            max_stale: Optional[float] = None,
+            maxsize: int = 1024,
+            max_bytes: int = 16 * 1024 * 1024,
+            sizer: Callable[[Any], int] = approx_size
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.max_stale = max(ttl, max_stale or 0)
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.sizer = sizer
+
+        self.entries: OrderedDict[Hashable, Entry] = OrderedDict()
+        self.bytes = 0
+        self.refreshing: set[Hashable] = set()
+        self.tasks: set[asyncio.Task] = set()  # background refreshes, kept until done
+        self.loads: dict[Hashable, asyncio.Task] = {}  # fetches of missing keys, shared by concurrent callers
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.stale_serves = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self.last_refresh_latency = 0.0
+        self.total_refresh_latency = 0.0
+
+    def seed(self, key: Hashable, value: Any, fetched_at: float) -> None:
+        with self.lock:
+            self._store(key, value, fetched_at, self.sizer(value))
+
+    def _remove(self, key: Hashable) -> None:
+        self.bytes -= self.entries.pop(key).size
+
+    def _store(self, key: Hashable, value: Any, fetched_at: float, size: int) -> None:
+        if key in self.entries:
+            self._remove(key)
+        entry = Entry(value, fetched_at, size)
+        if entry.size > self.max_bytes:
+            logger.warning(f"Not caching {self.name} value of {entry.size} bytes")
+            return
+        self.entries[key] = entry
+        self.bytes += entry.size
+
+        now = time.time()
+        for k in [k for k, e in self.entries.items() if now - e.fetched_at >= self.max_stale]:
+            self._remove(k)
+            self.expirations += 1
+        while len(self.entries) > self.maxsize or self.bytes > self.max_bytes:
+            self._remove(next(iter(self.entries)))
+            self.evictions += 1
+
+    def _lookup(self, key: Hashable) -> tuple[Optional[Entry], bool]:
+        """The entry to serve, if any, and whether it needs a refresh. Call with the lock held."""
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None, False
+
+        age = time.time() - entry.fetched_at
+        if age < self.ttl:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry, False
+        if age < self.max_stale:
+            self.entries.move_to_end(key)
+            self.stale_serves += 1
+            needs_refresh = key not in self.refreshing
+            self.refreshing.add(key)
+            return entry, needs_refresh
+
+        self._remove(key)
+        self.expirations += 1
+        self.misses += 1
+        return None, False
+
+    def _record_refresh(self, key: Hashable, value: Any, latency: float, sizes: list[int]) -> None:
+        if sizes:
+            size = sum(sizes)
+            record_payload(size)  # also part of the value of an enclosing cached call
+        else:
+            size = self.sizer(value)  # not read from a response, e.g. a snapshot
+        with self.lock:
+            self._store(key, value, time.time(), size)
+            self.refreshes += 1
+            self.last_refresh_latency = latency
+            self.total_refresh_latency += latency
+
+    def _record_failure(self, key: Hashable, e: Exception, background: bool) -> None:
+        with self.lock:
+            self.refresh_failures += 1
+        if background:
+            logger.warning(f"Background refresh of {self.name} failed: {type(e).__name__}: {e!s}")
+
+    def _refresh(self, key: Hashable, fetch: Callable[[], Any], background: bool = False) -> Any:
+        start = time.perf_counter()
+        sizes = []
+        token = payload_sizes.set(sizes)
+        try:
+            value = fetch()
+        except Exception as e:
+            self._record_failure(key, e, background)
+            if background:
+                return None
+            raise
+        finally:
+            payload_sizes.reset(token)
+            if background:
+                with self.lock:
+                    self.refreshing.discard(key)
+        self._record_refresh(key, value, time.perf_counter() - start, sizes)
+        return value
+
+    async def _arefresh(self, key: Hashable, fetch: Callable[[], Awaitable], background: bool = False) -> Any:
+        start = time.perf_counter()
+        sizes = []
+        token = payload_sizes.set(sizes)
+        try:
+            value = await fetch()
+        except Exception as e:
+            self._record_failure(key, e, background)
+            if background:
+                return None
+            raise
+        finally:
+            payload_sizes.reset(token)
+            if background:
+                with self.lock:
+                    self.refreshing.discard(key)
+        self._record_refresh(key, value, time.perf_counter() - start, sizes)
+        return value
+
+    def get(self, key: Hashable, fetch: Callable[[], Any]) -> Any:
+        with self.lock:
+            entry, needs_refresh = self._lookup(key)
+        if entry is None:
+            return self._refresh(key, fetch)
+        if needs_refresh:
+            threading.Thread(target=self._refresh, args=(key, fetch, True), daemon=True).start()
+        return entry.value
+
+    async def aget(self, key: Hashable, fetch: Callable[[], Awaitable]) -> Any:
+        with self.lock:
+            entry, needs_refresh = self._lookup(key)
+        if entry is None:
+            task = self.loads.get(key)
+            if task is None:
+                # A task, so that cancelling one caller does not fail the others
+                task = self.loads[key] = asyncio.create_task(self._arefresh(key, fetch))
+                task.add_done_callback(lambda t: self._loaded(key, t))
+            return await asyncio.shield(task)
+        if needs_refresh:
+            task = asyncio.create_task(self._arefresh(key, fetch, True))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+        return entry.value
+
+    def _loaded(self, key: Hashable, task: asyncio.Task) -> None:
+        self.loads.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # retrieved, even if every caller was cancelled
+
+    def invalidate(self, key: Hashable) -> None:
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+                self.invalidations += 1
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]) -> None:
+        with self.lock:
+            for key in [k for k in self.entries if predicate(k)]:
+                self._remove(key)
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self.lock:
+            self.invalidations += len(self.entries)
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict[str, Any]:
+        with self.lock:
+            lookups = self.hits + self.stale_serves + self.misses
+            return {
+                "size": len(self.entries),
+                "bytes": self.bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.stale_serves) / lookups if lookups else 0.0,
+                "stale_serves": self.stale_serves,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "refreshes": self.refreshes,
+                "refresh_failures": self.refresh_failures,
+                "last_refresh_latency": self.last_refresh_latency,
+                "avg_refresh_latency": self.total_refresh_latency / self.refreshes if self.refreshes else 0.0
+            }
+
+
+def cache_key(*args, **kwargs) -> Hashable:
+    return args, tuple(sorted(kwargs.items()))
+
+
+def cached(cache: BoundedCache, key: Callable[..., Hashable] = cache_key):
+    """Function decorator for sync and async functions."""
+
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                return await cache.aget(key(*args, **kwargs), lambda: func(*args, **kwargs))
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                return cache.get(key(*args, **kwargs), lambda: func(*args, **kwargs))
+
+        return wrapper
+
+    return decorator
+
+
+def cachedmethod(cache: Callable[[Any], BoundedCache]):
+    """Method decorator in the style of `cachetools.cachedmethod`. `self` is not part of the key."""
+
+    def decorator(method):
+        if inspect.iscoroutinefunction(method):
+            @functools.wraps(method)
+            async def wrapper(self, *args, **kwargs):
+                return await cache(self).aget(cache_key(*args, **kwargs), lambda: method(self, *args, **kwargs))
+        else:
+            @functools.wraps(method)
+            def wrapper(self, *args, **kwargs):
+                return cache(self).get(cache_key(*args, **kwargs), lambda: method(self, *args, **kwargs))
+
+        return wrapper
+
+    return decorator
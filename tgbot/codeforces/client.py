@@ -1,79 +1,157 @@
-import functools
 import logging
-from typing import Optional
+import math
+from typing import Any, Callable, Optional
 
+import orjson
 import requests
-from cachetools import TTLCache, cached
 
-from tgbot.codeforces.models import CodeforcesError, Contest, ContestPhase, Problem, Submission, User
+from tgbot.codeforces.cache import BoundedCache, cache_key, cachedmethod, record_payload
+from tgbot.codeforces.decoders import (
+    CompactContest, CompactProblem, CompactSubmission, decode_contests, decode_status
+)
+from tgbot.codeforces.models import CodeforcesError, CodeforcesUnavailableError, ContestPhase, User
+from tgbot.codeforces.problem_index import ProblemIndex
+from tgbot.codeforces.snapshot import ProblemsetSnapshot
+from tgbot.metrics import track
+from tgbot.resilience import CircuitBreaker, Resilience, RetryPolicy
+from tgbot.single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
 
 class CodeforcesAPI:
-    def __init__(self):
+    def __init__(
+            self,
+            snapshot: Optional[ProblemsetSnapshot] = None,
+            json_loads: Callable[[bytes], Any] = orjson.loads
+    ):
         self.base_url = "https://codeforces.com/api"
         self.session = requests.Session()
+        self.json_loads = json_loads
+        self.single_flight = SingleFlight()
+        # Commands wait for the reply, so fewer retries than in cf_update
+        self.resilience = Resilience(
+            CircuitBreaker("codeforces"),
+            RetryPolicy(attempts=2),
+            transient=(CodeforcesUnavailableError, requests.ConnectionError, requests.Timeout),
+            unavailable=CodeforcesUnavailableError
+        )
+        self.snapshot = snapshot or ProblemsetSnapshot()
+        self._problem_index: Optional[ProblemIndex] = None
 
-    def _request(self, endpoint, *args, **kwargs):
-        resp = self.session.get(f"{self.base_url}/{endpoint}", *args, timeout=10, **kwargs)
-        content_type = resp.headers["Content-Type"]
+        # Stale values are served while a background thread refreshes them
+        self.users_cache = BoundedCache("users", ttl=60, max_stale=10 * 60, max_bytes=4 * 1024 * 1024)
+        # The problemset changes little, so a snapshot of any age beats waiting for the download
+        self.problems_cache = BoundedCache(
+            "problems", ttl=10 * 60, max_stale=math.inf, maxsize=1, max_bytes=64 * 1024 * 1024
+        )
+        self.contests_cache = BoundedCache("contests", ttl=5 * 60, max_stale=60 * 60, maxsize=8)
 
-        if "Codeforces is temporarily unavailable." in resp.text:
-            raise CodeforcesError("Codeforces is temporarily unavailable.")
-        if "504 Gateway Time-out" in resp.text and "text/html" in content_type:
-            raise CodeforcesError("504 Gateway Timeout")
-        if "application/json" not in content_type:
-            raise CodeforcesError("Codeforces sent non-JSON response:\n{text}")
+        if self.snapshot.load():
+            logger.info(f"Loaded {len(self.snapshot.problems)} problems from snapshot")
+            self.problems_cache.seed(cache_key(), self.snapshot.problems, self.snapshot.updated)
 
-        try:
-            data = resp.json()
-        except Exception as e:
-            logger.error("Could not read JSON from response")
-            logger.error(resp.text)
-            raise e from None
-
-        if data["status"] == "FAILED":
-            if "not found" in data["comment"].lower():
-                raise CodeforcesError("Not found")
-            else:
-                raise CodeforcesError(data["comment"])
-        return data["result"]
+    def _request(self, endpoint: str, params: Optional[dict[str, Any]] = None) -> Any:
+        # Identical concurrent requests share one HTTP request and one parse
+        key = (endpoint, *sorted((params or {}).items()))
+        return self.single_flight.do(key, lambda: self.resilience.call(lambda: self._fetch(endpoint, params)))
+
+    def _fetch(self, endpoint: str, params: Optional[dict[str, Any]]) -> Any:
+        with track("codeforces", endpoint):
+            resp = self.session.get(f"{self.base_url}/{endpoint}", params=params, timeout=10)
+            content_type = resp.headers["Content-Type"]
+
+            # The body is decoded to text only to tell error pages apart
+            if "application/json" not in content_type:
+                if "Codeforces is temporarily unavailable." in resp.text:
+                    raise CodeforcesUnavailableError()
+                if "504 Gateway Time-out" in resp.text and "text/html" in content_type:
+                    raise CodeforcesUnavailableError("504 Gateway Timeout")
+                raise CodeforcesUnavailableError("Codeforces sent non-JSON response:\n{text}")
+
+            try:
+                data = self.json_loads(resp.content)
+                record_payload(len(resp.content))
+            except Exception as e:
+                logger.error("Could not read JSON from response")
+                logger.error(resp.text)
+                raise e from None
+
+            if data["status"] == "FAILED":
+                if "not found" in data["comment"].lower():
+                    raise CodeforcesError("Not found")
+                else:
+                    raise CodeforcesError(data["comment"])
+            return data["result"]
 
     def get_user(self, handle: str) -> User:
         return self.get_users(handle)[0]
 
-    @cached(cache=TTLCache(maxsize=1024, ttl=60))
+    @cachedmethod(lambda self: self.users_cache)
     def get_users(self, *handles: str) -> list[User]:
         data = self._request("user.info", params={"handles": ";".join(handles)})
         return [User(**u) for u in data]
 
-    def get_status(self, handle: str, count: Optional[int] = None) -> list[Submission]:
+    def get_raw_status(
+            self,
+            handle: str,
+            count: Optional[int] = None,
+            start: Optional[int] = None
+    ) -> list[dict[str, Any]]:
+        """Undecoded submissions, newest first. `start` is the 1-based index of the first one."""
         params = {"handle": handle}
         if count is not None:
             params["count"] = count
-        data = self._request("user.status", params=params)
-        status = [Submission(**s) for s in data]
-        status = [s for s in status if s.author.not_team() and s.problem.problemsetName is None]
-        return status
-
-    @cached(cache=TTLCache(maxsize=1, ttl=10 * 60))
-    def get_problems(self) -> list[Problem]:
-        data = self._request("problemset.problems")["problems"]
-        problems = [Problem(**p) for p in data]
-        problems = [p for p in problems if p.problemsetName is None]  # codeforces problems only
-        return problems
-
-    @cached(cache={})  # Store forever
-    def get_available_tags(self) -> set[str]:
+        if start is not None:
+            params["from"] = start
+        return self._request("user.status", params=params)
+
+    def get_status(self, handle: str, count: Optional[int] = None) -> list[CompactSubmission]:
+        data = self.get_raw_status(handle, count)
+        return decode_status(data)
+
+    @cachedmethod(lambda self: self.problems_cache)
+    def get_problems(self) -> list[CompactProblem]:
+        try:
+            data = self._request("problemset.problems")
+        except CodeforcesError as e:
+            if not self.snapshot.problems:
+                raise e from None
+            logger.warning(f"Serving problemset snapshot: {e!s}")
+            return self.snapshot.problems
+
+        added, changed, removed = self.snapshot.apply(data["problems"], data["problemStatistics"])
+        if added or changed or removed:
+            logger.info(f"Problemset snapshot: {added} added, {changed} changed, {removed} removed")
+        self.snapshot.save()
+        return self.snapshot.problems
+
+    def get_problem_index(self) -> ProblemIndex:
         problems = self.get_problems()
-        return functools.reduce(lambda t, p: t | set(p.tags), problems, set())
+        # Rebuild only when the problemset has been refreshed
+        if self._problem_index is None or self._problem_index.source is not problems:
+            self._problem_index = ProblemIndex(problems)
+        return self._problem_index
 
-    @cached(cache=TTLCache(maxsize=1, ttl=5 * 60))
-    def get_contests(self, phases: tuple[ContestPhase] = (ContestPhase.BEFORE, ContestPhase.CODING)) -> list[Contest]:
+    def get_available_tags(self) -> list[str]:
+        return self.get_problem_index().tags
+
+    @cachedmethod(lambda self: self.contests_cache)
+    def get_contests(
+            self,
+            phases: tuple[ContestPhase] = (ContestPhase.BEFORE, ContestPhase.CODING)
+    ) -> list[CompactContest]:
         data = self._request("contest.list", params={"gym": "false"})
-        contests = [Contest(**c) for c in data]
-        if phases:
-            contests = [c for c in contests if c.phase in phases]
+        contests = decode_contests(data, phases)
         contests.sort(key=lambda c: c.startTimeSeconds)
         return contests
+
+    def request_stats(self) -> dict[str, dict[str, int]]:
+        """Requests sent and identical requests coalesced into them, per endpoint."""
+        return self.single_flight.stats()
+
+    def cache_stats(self) -> dict[str, dict[str, Any]]:
+        return {
+            cache.name: cache.stats()
+            for cache in (self.users_cache, self.problems_cache, self.contests_cache)
+        }
@@ -0,0 +1,128 @@
+from string import capwords
+from typing import Any, Iterable, Optional
+
+from tgbot.codeforces.models import (
+    ContestMixin, ContestPhase, PartyMixin, ProblemMixin, RatingChangeMixin, SubmissionMixin, UserMixin
+)
+
+
+# Same attributes and methods as the pydantic models, without validation.
+# Nested objects are only built when accessed.
+
+
+class CompactUser(UserMixin):
+    __slots__ = ("handle", "rating", "rank", "maxRating", "maxRank")
+
+    def __init__(self, data: dict[str, Any]):
+        self.handle = data["handle"]
+        self.rating = data.get("rating")
+        self.rank = data.get("rank")
+        self.maxRating = data.get("maxRating")
+        self.maxRank = data.get("maxRank")
+        if self.rank:
+            self.rank = capwords(self.rank)
+            self.maxRank = capwords(self.maxRank)
+
+
+class CompactProblem(ProblemMixin):
+    __slots__ = ("contestId", "index", "problemsetName", "name", "rating", "tags")
+
+    def __init__(self, data: dict[str, Any]):
+        self.contestId = data.get("contestId")
+        self.index = data.get("index")
+        self.problemsetName = data.get("problemsetName")
+        self.name = data["name"]
+        self.rating = data.get("rating")
+        self.tags = data["tags"]
+
+
+class CompactParty(PartyMixin):
+    __slots__ = ("contestId", "participantType", "teamId", "_data", "_members")
+
+    def __init__(self, data: dict[str, Any]):
+        self.contestId = data.get("contestId")
+        self.participantType = data["participantType"]
+        self.teamId = data.get("teamId")
+        self._data = data
+        self._members: Optional[list[CompactUser]] = None
+
+    @property
+    def members(self) -> list[CompactUser]:
+        if self._members is None:
+            self._members = [CompactUser(u) for u in self._data["members"]]
+        return self._members
+
+
+class CompactContest(ContestMixin):
+    __slots__ = ("id", "name", "type", "phase", "durationSeconds", "startTimeSeconds")
+
+    def __init__(self, data: dict[str, Any]):
+        self.id = data["id"]
+        self.name = data["name"]
+        self.type = data["type"]
+        self.phase = data["phase"]
+        self.durationSeconds = data["durationSeconds"]
+        self.startTimeSeconds = data["startTimeSeconds"]
+
+
+class CompactSubmission(SubmissionMixin):
+    __slots__ = (
+        "id", "contestId", "creationTimeSeconds", "programmingLanguage", "verdict", "testset", "passedTestCount",
+        "_data", "_problem", "_author"
+    )
+
+    def __init__(self, data: dict[str, Any]):
+        self.id = data["id"]
+        self.contestId = data.get("contestId")
+        self.creationTimeSeconds = data["creationTimeSeconds"]
+        self.programmingLanguage = data["programmingLanguage"]
+        self.verdict = data.get("verdict")
+        self.testset = data["testset"]
+        self.passedTestCount = data["passedTestCount"]
+        self._data = data
+        self._problem: Optional[CompactProblem] = None
+        self._author: Optional[CompactParty] = None
+
+    @property
+    def problem(self) -> CompactProblem:
+        if self._problem is None:
+            self._problem = CompactProblem(self._data["problem"])
+        return self._problem
+
+    @property
+    def author(self) -> CompactParty:
+        if self._author is None:
+            self._author = CompactParty(self._data["author"])
+        return self._author
+
+    def dict(self) -> dict[str, Any]:
+        return self._data
+
+
+class CompactRatingChange(RatingChangeMixin):
+    __slots__ = ("contestId", "contestName", "handle", "rank", "ratingUpdateTimeSeconds", "oldRating", "newRating")
+
+    def __init__(self, data: dict[str, Any]):
+        self.contestId = data["contestId"]
+        self.contestName = data["contestName"]
+        self.handle = data["handle"]
+        self.rank = data["rank"]
+        self.ratingUpdateTimeSeconds = data["ratingUpdateTimeSeconds"]
+        self.oldRating = data["oldRating"]
+        self.newRating = data["newRating"]
+
+
+def decode_status(data: Iterable[dict[str, Any]]) -> list[CompactSubmission]:
+    # Individual submissions to codeforces problems only
+    return [
+        CompactSubmission(s) for s in data
+        if s["author"].get("teamId") is None and s["problem"].get("problemsetName") is None
+    ]
+
+
+def decode_contests(data: Iterable[dict[str, Any]], phases: tuple[ContestPhase, ...] = ()) -> list[CompactContest]:
+    return [CompactContest(c) for c in data if not phases or c["phase"] in phases]
+
+
+def decode_rating_changes(data: Iterable[dict[str, Any]]) -> dict[str, CompactRatingChange]:
+    return {rc["handle"]: CompactRatingChange(rc) for rc in data}
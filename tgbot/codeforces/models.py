@@ -12,18 +12,15 @@ class CodeforcesError(Exception):
     pass
 
 
-class User(BaseModel):
-    handle: str
-    rating: Optional[int] = None
-    rank: Optional[str] = None
-    maxRating: Optional[int] = None
-    maxRank: Optional[str] = None
+class CodeforcesUnavailableError(CodeforcesError):
+    """Codeforces is down or did not answer in time."""
 
-    def __init__(self, **data):
-        super().__init__(**data)
-        if self.rank:
-            self.rank = capwords(self.rank)
-            self.maxRank = capwords(self.maxRank)
+    def __init__(self, message: str = "Codeforces is temporarily unavailable.") -> None:
+        super().__init__(message)
+
+
+class UserMixin:
+    __slots__ = ()
 
     @property
     def url(self):
@@ -43,13 +40,22 @@ class User(BaseModel):
         return text
 
 
-class Problem(BaseModel):
-    contestId: Optional[int]
-    index: Optional[str]
-    problemsetName: Optional[str]
-    name: str
+class User(UserMixin, BaseModel):
+    handle: str
     rating: Optional[int] = None
-    tags: list[str]
+    rank: Optional[str] = None
+    maxRating: Optional[int] = None
+    maxRank: Optional[str] = None
+
+    def __init__(self, **data):
+        super().__init__(**data)
+        if self.rank:
+            self.rank = capwords(self.rank)
+            self.maxRank = capwords(self.maxRank)
+
+
+class ProblemMixin:
+    __slots__ = ()
 
     @property
     def id(self) -> str:
@@ -70,6 +76,15 @@ class Problem(BaseModel):
         return text
 
 
+class Problem(ProblemMixin, BaseModel):
+    contestId: Optional[int]
+    index: Optional[str]
+    problemsetName: Optional[str]
+    name: str
+    rating: Optional[int] = None
+    tags: list[str]
+
+
 class ParticipantType(str, Enum):
     CONTESTANT = "CONTESTANT"
     PRACTICE = "PRACTICE"
@@ -78,15 +93,19 @@ class ParticipantType(str, Enum):
     OUT_OF_COMPETITION = "OUT_OF_COMPETITION"
 
 
-class Party(BaseModel):
+class PartyMixin:
+    __slots__ = ()
+
+    def not_team(self) -> bool:
+        return self.teamId is None
+
+
+class Party(PartyMixin, BaseModel):
     contestId: Optional[int]
     members: list[User]
     participantType: ParticipantType
     teamId: Optional[int] = None
 
-    def not_team(self) -> bool:
-        return self.teamId is None
-
 
 class ContestScoring(str, Enum):
     CF = "CF"
@@ -102,13 +121,8 @@ class ContestPhase(str, Enum):
     FINISHED = "FINISHED"
 
 
-class Contest(BaseModel):
-    id: int
-    name: str
-    type: ContestScoring
-    phase: ContestPhase
-    durationSeconds: int
-    startTimeSeconds: int
+class ContestMixin:
+    __slots__ = ()
 
     @property
     def start_time(self) -> datetime:
@@ -141,22 +155,25 @@ class Contest(BaseModel):
         return text
 
 
-class Submission(BaseModel):
+class Contest(ContestMixin, BaseModel):
     id: int
-    contestId: Optional[int]
-    creationTimeSeconds: int
-    problem: Problem
-    author: Party
-    programmingLanguage: str
-    verdict: Optional[str] = None
-    testset: str
-    passedTestCount: int
+    name: str
+    type: ContestScoring
+    phase: ContestPhase
+    durationSeconds: int
+    startTimeSeconds: int
+
+
+class SubmissionMixin:
+    __slots__ = ()
 
-    def __eq__(self, other: "Submission") -> bool:
-        return (self.id == other.id
-                and self.verdict == other.verdict
-                and self.testset == other.testset
-                and self.passedTestCount == other.passedTestCount)
+    @property
+    def fingerprint(self) -> tuple[int, Optional[str], str, int]:
+        """The fields that change while a submission is judged."""
+        return self.id, self.verdict, self.testset, self.passedTestCount
+
+    def __eq__(self, other: "SubmissionMixin") -> bool:
+        return self.fingerprint == other.fingerprint
 
     @property
     def time(self) -> datetime:
@@ -202,14 +219,20 @@ class Submission(BaseModel):
         return text
 
 
-class RatingChange(BaseModel):
-    contestId: int
-    contestName: str
-    handle: str
-    rank: int
-    ratingUpdateTimeSeconds: int
-    oldRating: int
-    newRating: int
+class Submission(SubmissionMixin, BaseModel):
+    id: int
+    contestId: Optional[int]
+    creationTimeSeconds: int
+    problem: Problem
+    author: Party
+    programmingLanguage: str
+    verdict: Optional[str] = None
+    testset: str
+    passedTestCount: int
+
+
+class RatingChangeMixin:
+    __slots__ = ()
 
     @property
     def delta(self) -> str:
@@ -220,3 +243,13 @@ class RatingChange(BaseModel):
 
     def get_table_row(self) -> tuple[int, str, str]:
         return self.rank, self.handle, self.delta
+
+
+class RatingChange(RatingChangeMixin, BaseModel):
+    contestId: int
+    contestName: str
+    handle: str
+    rank: int
+    ratingUpdateTimeSeconds: int
+    oldRating: int
+    newRating: int
@@ -0,0 +1,64 @@
+import random
+from bisect import bisect_left, bisect_right
+from typing import Optional
+
+from tgbot.codeforces.decoders import CompactProblem
+
+
+def popcount(mask: int) -> int:
+    return bin(mask).count("1")
+
+
+def nth_set_bit(mask: int, n: int) -> int:
+    """Return the position of the n-th (0-based) set bit of mask."""
+    lo, hi = 0, mask.bit_length() - 1
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if popcount(mask & ((2 << mid) - 1)) > n:
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
+
+
+class ProblemIndex:
+    """Bitset index over a problemset for tag and rating queries.
+
+    Problems are stored in rating order, so a rating range maps to a contiguous
+    run of bits and a query is a handful of integer ANDs.
+    """
+
+    def __init__(self, problems: list[CompactProblem]):
+        self.source = problems
+        self.problems = sorted(problems, key=lambda p: p.rating or 0)
+        self.ratings = [p.rating or 0 for p in self.problems]
+        self.all_mask = (1 << len(self.problems)) - 1
+
+        self.tag_masks: dict[str, int] = {}
+        for i, problem in enumerate(self.problems):
+            for tag in problem.tags:
+                self.tag_masks[tag] = self.tag_masks.get(tag, 0) | (1 << i)
+
+        self.tags = sorted(self.tag_masks)
+        self.regular_mask = self.all_mask & ~self.tag_masks.get("*special", 0)
+
+    def rating_mask(self, r_min: int, r_max: int) -> int:
+        lo = bisect_left(self.ratings, max(r_min, 1))  # unrated problems are never in range
+        hi = bisect_right(self.ratings, r_max)
+        if lo >= hi:
+            return 0
+        return ((1 << hi) - 1) ^ ((1 << lo) - 1)
+
+    def query(self, tags: set[str], rating: Optional[list[int]] = None) -> int:
+        mask = self.all_mask if "*special" in tags else self.regular_mask
+        for tag in tags:
+            mask &= self.tag_masks.get(tag, 0)
+            if not mask:
+                return 0
+        if rating:
+            mask &= self.rating_mask(rating[0], rating[1])
+        return mask
+
+    def select(self, tags: set[str], rating: Optional[list[int]] = None) -> Optional[CompactProblem]:
+        if mask := self.query(tags, rating):
+            return self.problems[nth_set_bit(mask, random.randrange(popcount(mask)))]
@@ -0,0 +1,116 @@
+import json
+import logging
+import os
+import sys
+import time
+from typing import Any, Optional
+
+from tgbot.codeforces.decoders import CompactProblem
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the file layout or the meaning of a field changes; older snapshots are then ignored.
+SNAPSHOT_VERSION = 1
+
+
+def problem_key(p: dict[str, Any]) -> str:
+    return f"{p.get('contestId')}{p.get('index')}"
+
+
+class ProblemsetSnapshot:
+    """Local copy of `problemset.problems` that is refreshed by applying diffs.
+
+    Only Codeforces problems (no `problemsetName`) are kept, in payload order.
+    Without a path the snapshot lives in memory only.
+    """
+
+    def __init__(self, path: Optional[str] = None, fallback_path: Optional[str] = None):
+        self.path = path
+        self.fallback_path = fallback_path
+        self.updated = 0.0
+        self.raw: dict[str, dict[str, Any]] = {}
+        self.solved_counts: dict[str, int] = {}
+        self.problems: list[CompactProblem] = []
+        self._problems: dict[str, CompactProblem] = {}
+
+    def load(self) -> bool:
+        for path in (self.path, self.fallback_path):
+            if not path or not os.path.exists(path):
+                continue
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not read problemset snapshot {path}: {e!s}")
+                continue
+            if data.get("version") != SNAPSHOT_VERSION:
+                logger.info(f"Ignoring problemset snapshot {path} with version {data.get('version')}")
+                continue
+
+            self.apply(data["problems"], data["problemStatistics"])
+            self.updated = data["updated"]
+            return True
+        return False
+
+    def save(self) -> None:
+        if not self.path:
+            return
+
+        data = {
+            "version": SNAPSHOT_VERSION,
+            "updated": self.updated,
+            "problems": list(self.raw.values()),
+            "problemStatistics": [
+                {"key": key, "solvedCount": count} for key, count in self.solved_counts.items()
+            ]
+        }
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not write problemset snapshot {self.path}: {e!s}")
+
+    def apply(self, problems: list[dict[str, Any]], statistics: list[dict[str, Any]]) -> tuple[int, int, int]:
+        """Bring the snapshot up to date with a `problemset.problems` result.
+
+        Returns the number of added, changed and removed problems.
+        """
+        raw = {}
+        added = changed = 0
+        for p in problems:
+            if p.get("problemsetName") is not None:  # codeforces problems only
+                continue
+            key = problem_key(p)
+            raw[key] = p
+            if key not in self.raw:
+                added += 1
+            elif self.raw[key] != p:
+                changed += 1
+            else:
+                continue
+            self._problems[key] = CompactProblem(p)
+
+        removed = [key for key in self.raw if key not in raw]
+        for key in removed:
+            del self._problems[key]
+
+        self.raw = raw
+        self.solved_counts = {
+            s.get("key") or problem_key(s): s["solvedCount"] for s in statistics
+        }
+        self.updated = time.time()
+        if added or changed or removed or len(self.problems) != len(raw):
+            self.problems = [self._problems[key] for key in raw]
+        return added, changed, len(removed)
+
+
+if __name__ == "__main__":
+    # Bundle a snapshot with the deployment: python -m tgbot.codeforces.snapshot tgbot/problemset.json
+    from tgbot.codeforces.client import CodeforcesAPI
+
+    snapshot = ProblemsetSnapshot(sys.argv[1])
+    data = CodeforcesAPI()._request("problemset.problems")
+    snapshot.apply(data["problems"], data["problemStatistics"])
+    snapshot.save()
@@ -0,0 +1,127 @@
+import contextlib
+import math
+from typing import Any, ContextManager, Optional
+
+from tgbot.clist.models import ContestInfo
+from tgbot.codeforces import User
+from tgbot.metrics import command_seconds
+
+HELP_TEXT = (
+    "Commands:\n"
+    "    /help - Hi\n"
+    "    /sign_on - Verify your codeforces handle\n"
+    "    /stalk - Show codeforces profile\n"
+    "    /explode - Show verified codeforces handles\n"
+    "    /select - Random codeforces problem\n"
+    "        Parameters:\n"
+    "            tags: csv form of tags\n"
+    "            rating: rating range\n"
+    "        Example usage:\n"
+    "            /select rating=1800-2000\n"
+    "            /select tags=math,dp\n"
+    "            /select tags=fft|rating=2400\n"
+    "    /tags - Show available tags\n"
+    "    /contests - Show upcoming contests\n"
+    "    /delta - Check predicted/official rating changes\n\n"
+    "If you are willing to contribute, please submit a PR "
+    "<a href='https://github.com/eepnt/tgbot_codeforcewarrior'>here</a>."
+)
+SIGN_ON_COMMANDS = ("/sign_on", "/signon", "/sign_in", "/signin")
+COMMANDS = (
+    "/help", "/group_admin", "/group_girlgod", "/tags", "/select", *SIGN_ON_COMMANDS, "/stalk", "/explode",
+    "/contests", "/delta"
+)
+SIGN_ON_PROMPT = (
+    "請申請帳號: https://codeforces.com/register\n"
+    "並在此輸入 <code>/sign_on your_codeforces_username</code>"
+)
+JOIN_REQUEST_TEXT = "妳好，進入本群需持有 codeforces 帳號\n" + SIGN_ON_PROMPT
+HANDLE_TAKEN_TEXT = (
+    "已有成員已登記此 handle\n"
+    "如果你確實持有這 codeforces 帳號，請聯絡 @jowonowo"
+)
+GROUP_ADMIN_STICKER = "CAACAgUAAxkBAAEJajlisHTO24Hg08vl_4yyrtoqifSYTgACGQcAArcy0VcwPcCmXDt1AygE"
+NEW_MEMBER_STICKER = "CAACAgUAAxkBAAEJmfViw_xn_Bw-ItG3mI1K_CZc5iarTgACQgUAAs4ICVViKPYgGUNc7ykE"
+
+
+def parse_command(message: dict[str, Any]) -> tuple[str, str, Optional[dict[str, Any]]]:
+    """Split a text message into the command, its argument and the sender (None for bots)."""
+    splits = message["text"].split(' ', 1)
+    command = splits[0].replace("@codeforcewarrior_bot", "")
+    if len(splits) == 1:
+        splits.append("")
+    user = message["from"]
+    if user["is_bot"]:
+        user = None
+    return command, splits[1].strip(), user
+
+
+def timed(command: str) -> ContextManager[None]:
+    """Record the latency of a command. Other messages are not recorded, to keep the metric labels bounded."""
+    return command_seconds.time(command) if command in COMMANDS else contextlib.nullcontext()
+
+
+def parse_select_query(content: str) -> tuple[set[str], Optional[list[int]]]:
+    """Parse `tags=a,b|rating=lo-hi`. Raises ValueError if the query is invalid."""
+    tags = set()
+    rating = None
+    splits = [s.strip() for s in content.split('|') if s and not s.isspace()]
+    for entry in splits:
+        mini_splits = entry.split('=', maxsplit=1)
+        if len(mini_splits) != 2:
+            raise ValueError
+        if mini_splits[0] == "tags":
+            micro_splits = mini_splits[1].split(',')
+            micro_splits = [s.strip() for s in micro_splits if s and not s.isspace()]
+            tags |= set(micro_splits)
+        elif mini_splits[0] == "rating":
+            rating = [int(r) for r in mini_splits[1].split('-', maxsplit=1)]
+            if len(rating) == 1:
+                rating *= 2  # [r] -> [r, r]
+        else:
+            raise ValueError
+    return tags, rating
+
+
+def suggested_rating(cf_user: User) -> list[int]:
+    if cf_user.rating:
+        r_min = max(math.ceil(cf_user.rating / 100) * 100, 800)
+    else:
+        r_min = 800
+    return [r_min, r_min + 200]
+
+
+def sign_on_instructions(problem_name: str) -> str:
+    return (
+        f"請在十分鐘內到 {problem_name} 提交任何程式作身份驗證\n"
+        "你可以忽略題目要求並提交錯誤的程式\n"
+        "我在提交後半分鐘內會確認你的身份"
+    )
+
+
+def contests_text(contests: list[ContestInfo]) -> str:
+    if not contests:
+        return "No contests in the next 2 weeks"
+
+    text = []
+    for i in range(len(contests)):
+        if i > 0 and contests[i - 1].can_join(contests[i]):
+            del text[-1]
+            text.append(contests[i - 1].join_str(contests[i]))
+        else:
+            text.append(str(contests[i]))
+    return "\n\n".join(text)
+
+
+def send_sticker(chat_id: int, sticker: str) -> dict[str, Any]:
+    return {"method": "sendSticker", "chat_id": chat_id, "sticker": sticker}
+
+
+def send_message(chat_id: int, text: str, disable_web_page_preview: bool = False) -> dict[str, Any]:
+    return {
+        "method": "sendMessage",
+        "chat_id": chat_id,
+        'text': text,
+        "parse_mode": "HTML",
+        "disable_web_page_preview": str(disable_web_page_preview).lower()
+    }
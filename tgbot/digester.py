@@ -0,0 +1,195 @@
+"""Replies to Telegram updates, shared by the Flask bot and the aiohttp webhook.
+
+`digest` holds the command logic without doing any I/O itself: it yields a `Call`
+for every lookup or side effect, and the bot performs it (blocking with `run`,
+or async with `arun`) and sends back the result, or throws the exception in.
+"""
+from datetime import datetime, timedelta
+from typing import Any, Generator, NamedTuple, Optional
+
+from tgbot.codeforces import CodeforcesError, CodeforcesUnavailableError
+from tgbot.codeforces.decoders import CompactProblem
+from tgbot.commands import (
+    GROUP_ADMIN_STICKER, HANDLE_TAKEN_TEXT, HELP_TEXT, JOIN_REQUEST_TEXT, NEW_MEMBER_STICKER, SIGN_ON_COMMANDS,
+    SIGN_ON_PROMPT, contests_text, parse_command, parse_select_query, send_message, send_sticker,
+    sign_on_instructions, suggested_rating, timed
+)
+from tgbot.config import config
+
+
+class Call(NamedTuple):
+    """A method of the bot to call, e.g. `Call("get_user", ("tourist",))`."""
+    name: str
+    args: tuple = ()
+
+
+class Reply(NamedTuple):
+    text: Optional[str] = None  # reply text in the same chat
+    response: Optional[dict[str, Any]] = None  # response objects for other endpoints
+    disable_web_page_preview: bool = False
+
+
+Steps = Generator[Call, Any, Any]
+
+
+def digest(data: dict[str, Any]) -> Steps:
+    """The response to an update, if any."""
+    reply = Reply()
+    try:
+        if "message" in data:
+            message = data["message"]
+            if "text" in message:
+                cmd, content, user = parse_command(message)
+                with timed(cmd):
+                    reply = yield from command(message, cmd, content, user)
+            elif "new_chat_member" in message:
+                if not message["new_chat_member"]["is_bot"]:
+                    reply = Reply(response=send_sticker(message["chat"]["id"], NEW_MEMBER_STICKER))
+        elif "chat_join_request" in data:
+            reply = yield from chat_join_request(data["chat_join_request"])
+    except CodeforcesUnavailableError:
+        reply = Reply("Codeforces is temporarily unavailable.")
+
+    if reply.text and "message" in data:
+        return send_message(data["message"]["chat"]["id"], reply.text, reply.disable_web_page_preview)
+    return reply.response
+
+
+def select(tags: set[str], rating: Optional[list[int]]) -> Generator[Call, Any, Optional[CompactProblem]]:
+    index = yield Call("get_problem_index")
+    return index.select(tags, rating)
+
+
+def command(
+        message: dict[str, Any],
+        cmd: str,
+        content: str,
+        user: Optional[dict[str, Any]]
+) -> Generator[Call, Any, Reply]:
+    chat_id = message["chat"]["id"]
+
+    if cmd == "/help":
+        return Reply(HELP_TEXT, disable_web_page_preview=True)
+    elif cmd in ("/group_admin", "/group_girlgod"):
+        return Reply(response=send_sticker(chat_id, GROUP_ADMIN_STICKER))
+    elif cmd == "/tags":
+        index = yield Call("get_problem_index")
+        return Reply("Tags: " + ", ".join(index.tags))
+    elif cmd == "/select":
+        try:
+            tags, rating = parse_select_query(content)
+        except ValueError:
+            return Reply("Your query is invalid")
+
+        r_suggested = False
+        if not rating and (handle := (yield Call("get_handle", (user["id"],)))):
+            r_suggested = True
+            rating = suggested_rating((yield Call("get_user", (handle,))))
+
+        problem = yield from select(tags, rating)
+        if not problem and r_suggested:
+            problem = yield from select(tags, rating := None)
+
+        if problem:
+            return Reply(str(problem))
+        return Reply(f"no problem match search criteria {tags} {rating}")
+    elif cmd in SIGN_ON_COMMANDS and user:
+        if content == "":
+            return Reply(SIGN_ON_PROMPT)
+        elif content == "tourist":
+            return Reply("咪扮")
+
+        try:
+            cf_user = yield Call("get_user", (content,))
+        except CodeforcesError as e:
+            if str(e) == "Not found":
+                return Reply("This codeforces user cannot be found")
+            raise e from None
+
+        # Check for cf handle collision
+        for owner in (yield Call("get_handle_owners", (cf_user.handle,))):
+            if owner == str(user["id"]):
+                return Reply("你已登記此 handle")
+            return Reply(HANDLE_TAKEN_TEXT)
+
+        problem = yield from select(set(), rating=[3000, 3500])
+        yield Call("set_verification", (user["id"], {
+            "handle": cf_user.handle,
+            "problem_id": problem.id,
+            "chat_id": chat_id,
+            "message_id": message["message_id"],
+            "count": 0
+        }))
+        yield Call(
+            "schedule_task",
+            ("cf_verification", {"user_id": user["id"]}, datetime.utcnow() + timedelta(seconds=30))
+        )
+        return Reply(sign_on_instructions(problem.linked_name))
+    elif cmd == "/stalk":
+        if "reply_to_message" in message:
+            user_id = message["reply_to_message"]["from"]["id"]
+        else:
+            user_id = user["id"]
+        if handle := (yield Call("get_handle", (user_id,))):
+            return Reply(str((yield Call("get_user", (handle,)))))
+        return Reply("Not yet use /sign_on")
+    elif cmd == "/explode":
+        if chat_id != config["CHAT_ID"] and not (yield Call("get_handle", (user["id"],))):
+            return Reply("Please use this command inside the group.")
+
+        handles = yield Call("get_handles")
+        users = yield Call("get_users", (handles,))
+        return Reply((yield Call("render_leaderboard", (users,))))
+    elif cmd == "/contests":
+        contests = yield Call("get_upcoming_contests")
+        return Reply(contests_text(contests), disable_web_page_preview=bool(contests))
+    elif cmd == "/delta":
+        if chat_id == config["CHAT_ID"] or (yield Call("get_handle", (user["id"],))):
+            yield Call("request_delta", (chat_id,))  # cf_update replies in the chat
+            return Reply()
+        return Reply("Please use this command inside the group.")
+    return Reply()
+
+
+def chat_join_request(chat_join_request: dict[str, Any]) -> Generator[Call, Any, Reply]:
+    user_id = chat_join_request["from"]["id"]
+    if (yield Call("get_handle", (user_id,))):
+        return Reply(response={
+            "method": "approveChatJoinRequest",
+            "chat_id": config["CHAT_ID"],
+            "user_id": user_id
+        })
+
+    yield Call(
+        "schedule_task",
+        ("decline_join_request", {"user_id": user_id}, datetime.utcnow() + timedelta(seconds=30 * 60))
+    )
+    return Reply(response=send_message(user_id, JOIN_REQUEST_TEXT))
+
+
+def run(steps: Steps, bot: Any) -> Any:
+    """Perform the calls of `steps` with the blocking methods of `bot`, and return the result."""
+    result, error = None, None
+    while True:
+        try:
+            call = steps.throw(error) if error else steps.send(result)
+        except StopIteration as e:
+            return e.value
+        try:
+            result, error = getattr(bot, call.name)(*call.args), None
+        except Exception as e:
+            result, error = None, e
+
+
+async def arun(steps: Steps, bot: Any) -> Any:
+    """Perform the calls of `steps` with the async methods of `bot`, and return the result."""
+    result, error = None, None
+    while True:
+        try:
+            call = steps.throw(error) if error else steps.send(result)
+        except StopIteration as e:
+            return e.value
+        try:
+            result, error = await getattr(bot, call.name)(*call.args), None
+        except Exception as e:
+            result, error = None, e
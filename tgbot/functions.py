@@ -7,12 +7,16 @@ from flask import Request
 
 from tgbot.codeforces import CodeforcesAPI
 from tgbot.config import config
-from tgbot.gcp_common import db, get_handles, make_tg_api_request, schedule_task
+from tgbot.gcp_common import (
+    get_db, make_tg_api_request, schedule_task, setup_cloud_logging, stream_handles, warm_up
+)
 from tgbot.utils import hkt_now
 
 logger = logging.getLogger(__name__)
 cf_client = CodeforcesAPI()
 
+warm_up(setup_cloud_logging)
+
 
 def verify(handle: str, problem_id: str) -> bool:
     status = cf_client.get_status(handle, count=10)
@@ -27,7 +31,7 @@ def verify(handle: str, problem_id: str) -> bool:
 def cf_verification(request: Request) -> str:
     user_id = request.json["user_id"]
 
-    doc_ref = db.collection("cfbot_verification").document(str(user_id))
+    doc_ref = get_db().collection("cfbot_verification").document(str(user_id))
     doc = doc_ref.get()
 
     if not doc.exists:
@@ -43,7 +47,7 @@ def cf_verification(request: Request) -> str:
     if verify(handle, problem_id):
         doc_ref.delete()
 
-        db.collection("cfbot_handle").document(str(user_id)).set({"handle": handle})
+        get_db().collection("cfbot_handle").document(str(user_id)).set({"handle": handle})
 
         make_tg_api_request(
             "sendMessage",
@@ -67,7 +71,7 @@ def cf_verification(request: Request) -> str:
         # Notify cf_update
         requests.post(
             f"{config['CF_UPDATE_URL']}/",
-            json={"handles": get_handles()},
+            json={"handles": stream_handles()},
             headers={"X-Auth-Token": config["SECRET"]}
         )
 
@@ -1,53 +1,130 @@
+import functools
 import json
 import logging
+import threading
 from datetime import datetime
-from typing import Any, Optional
+from typing import Any, Callable, Optional, TypeVar
 
-import google.cloud.logging
 import requests
-from cachetools import TTLCache, cached
-from google.cloud import firestore, tasks_v2
-from google.protobuf import timestamp_pb2
 
 from tgbot.config import config
+from tgbot.handle_replica import FirestoreHandleBackend, HandleReplica
+from tgbot.metrics import track, upstream_errors
 
-google.cloud.logging.Client().setup_logging()
+# GCP clients are slow to import and build, so each one is created on first use.
+# Entry points can start them early in the background with warm_up().
 
-try:
-    import googleclouddebugger
-
-    googleclouddebugger.enable(breakpoint_enable_canary=False)
-except ImportError:
-    pass
+T = TypeVar("T")
 
 logger = logging.getLogger(__name__)
 session = requests.Session()
 
-resp = session.get(
-    "http://metadata.google.internal/computeMetadata/v1/project/project-id",
-    headers={"Metadata-Flavor": "Google"}
-)
-PROJECT_ID = resp.text
 
-# load firestore
-db = firestore.Client(project=PROJECT_ID)
+def lazy(func: Callable[[], T]) -> Callable[[], T]:
+    """Call `func` once, on first use, and return its result from then on."""
+    lock = threading.Lock()
+    result = []
 
-# load cloud task config
-task_client = tasks_v2.CloudTasksClient()
-task_parent = task_client.queue_path(PROJECT_ID, "asia-northeast1", "cfbot-verification")
+    @functools.wraps(func)
+    def wrapper() -> T:
+        if not result:
+            with lock:
+                if not result:
+                    result.append(func())
+        return result[0]
 
+    return wrapper
 
-def make_tg_api_request(endpoint, params: dict[str, Any]) -> requests.Response:
+
+@lazy
+def setup_cloud_logging() -> None:
+    import google.cloud.logging
+
+    google.cloud.logging.Client().setup_logging()
+
+
+@lazy
+def enable_debugger() -> None:
+    try:
+        import googleclouddebugger
+
+        googleclouddebugger.enable(breakpoint_enable_canary=False)
+    except ImportError:
+        pass
+
+
+@lazy
+def get_project_id() -> str:
     resp = session.get(
-        f"https://api.telegram.org/bot{config['TOKEN']}/{endpoint}",
-        params=params,
-        timeout=5
+        "http://metadata.google.internal/computeMetadata/v1/project/project-id",
+        headers={"Metadata-Flavor": "Google"}
     )
+    return resp.text
+
+
+@lazy
+def get_db() -> Any:
+    from google.cloud import firestore
+
+    return firestore.Client(project=get_project_id())
+
+
+@lazy
+def get_task_client() -> Any:
+    from google.cloud import tasks_v2
+
+    return tasks_v2.CloudTasksClient()
+
+
+@lazy
+def get_task_parent() -> str:
+    return get_task_client().queue_path(get_project_id(), "asia-northeast1", "cfbot-verification")
+
+
+@lazy
+def get_handle_replica() -> HandleReplica:
+    # user id -> handle, kept current by a snapshot listener
+    return HandleReplica(FirestoreHandleBackend(get_db().collection("cfbot_handle")))
+
+
+def warm_up(*inits: Callable[[], Any]) -> None:
+    """Run initializers in background threads, in parallel with each other and with serving."""
+    for init in inits:
+        threading.Thread(target=init, daemon=True).start()
+
+
+def make_tg_api_request(endpoint, params: dict[str, Any]) -> requests.Response:
+    with track("telegram", endpoint):
+        resp = session.get(
+            f"https://api.telegram.org/bot{config['TOKEN']}/{endpoint}",
+            params=params,
+            timeout=5
+        )
+        if not resp.ok:
+            upstream_errors.inc("telegram", endpoint, f"HTTP {resp.status_code}")
     logger.info(f"TG API request: {resp.status_code}")
     return resp
 
 
+def set_commands() -> None:
+    make_tg_api_request("setMyCommands", params={
+        "commands": json.dumps([
+            {"command": "help", "description": "See help message"},
+            {"command": "sign_on", "description": "Verify your codeforces handle"},
+            {"command": "stalk", "description": "Show codeforces profile"},
+            {"command": "explode", "description": "Show verified codeforces handles"},
+            {"command": "select", "description": "Get a problem"},
+            {"command": "tags", "description": "List problem tags"},
+            {"command": "contests", "description": "See upcoming contests"},
+            {"command": "delta", "description": "Check rating changes"}
+        ])
+    })
+
+
 def schedule_task(endpoint: str, data: dict[str, Any], dt: datetime) -> None:
+    from google.cloud import tasks_v2
+    from google.protobuf import timestamp_pb2
+
     timestamp = timestamp_pb2.Timestamp()
     timestamp.FromDatetime(dt)
 
@@ -60,18 +137,29 @@ def schedule_task(endpoint: str, data: dict[str, Any], dt: datetime) -> None:
         },
         "schedule_time": timestamp
     }
-    task_client.create_task(parent=task_parent, task=task)
+    get_task_client().create_task(parent=get_task_parent(), task=task)
 
 
 def get_handle(user_id: int) -> Optional[str]:
-    doc = db.collection("cfbot_handle").document(str(user_id)).get()
-    if doc.exists:
-        return doc.to_dict()["handle"]
+    return get_handle_replica().get_handle(user_id)
+
+
+def get_handle_owners(handle: str) -> list[str]:
+    """Ids of the users who registered `handle`."""
+    return get_handle_replica().get_owners(handle)
+
+
+def set_verification(user_id: int, data: dict[str, Any]) -> None:
+    get_db().collection("cfbot_verification").document(str(user_id)).set(data)
 
 
-@cached(cache=TTLCache(maxsize=1, ttl=5))
 def get_handles() -> list[str]:
+    return get_handle_replica().get_handles()
+
+
+def stream_handles() -> list[str]:
+    """Read every handle from Firestore, including writes the replica may not have seen yet."""
     handles = []
-    for doc in db.collection("cfbot_handle").stream():
+    for doc in get_db().collection("cfbot_handle").stream():
         handles.append(doc.to_dict()["handle"])
     return handles
@@ -0,0 +1,136 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Called with {user_id: handle}, where a handle of None means the user was removed
+OnChange = Callable[[dict[str, Optional[str]]], None]
+
+
+class FirestoreHandleBackend:
+    """Streams the `cfbot_handle` collection with a snapshot listener."""
+
+    def __init__(self, collection: Any):
+        self.collection = collection
+        self.watch_handle = None
+
+    def watch(self, on_change: OnChange) -> None:
+        def on_snapshot(docs, changes, read_time) -> None:
+            on_change({
+                change.document.id: None if change.type.name == "REMOVED" else change.document.to_dict()["handle"]
+                for change in changes
+            })
+
+        # The first snapshot lists every document as ADDED
+        self.watch_handle = self.collection.on_snapshot(on_snapshot)
+
+    def read(self) -> dict[str, str]:
+        return {doc.id: doc.to_dict()["handle"] for doc in self.collection.stream()}
+
+    def read_handle(self, user_id: str) -> Optional[str]:
+        doc = self.collection.document(user_id).get()
+        return doc.to_dict()["handle"] if doc.exists else None
+
+    def read_owners(self, handle: str) -> list[str]:
+        return [doc.id for doc in self.collection.where("handle", "==", handle).stream()]
+
+    def close(self) -> None:
+        if self.watch_handle is not None:
+            self.watch_handle.unsubscribe()
+
+
+class InMemoryHandleBackend:
+    """Backend for tests and local runs. Changes are delivered synchronously."""
+
+    def __init__(self, handles: Optional[dict[str, str]] = None):
+        self.handles = dict(handles or {})
+        self.listeners: list[OnChange] = []
+
+    def watch(self, on_change: OnChange) -> None:
+        self.listeners.append(on_change)
+        on_change(dict(self.handles))
+
+    def read(self) -> dict[str, str]:
+        return dict(self.handles)
+
+    def read_handle(self, user_id: str) -> Optional[str]:
+        return self.handles.get(user_id)
+
+    def read_owners(self, handle: str) -> list[str]:
+        return [user_id for user_id, h in self.handles.items() if h == handle]
+
+    def set(self, user_id: str, handle: Optional[str]) -> None:
+        if handle is None:
+            self.handles.pop(user_id, None)
+        else:
+            self.handles[user_id] = handle
+        for on_change in self.listeners:
+            on_change({user_id: handle})
+
+    def close(self) -> None:
+        self.listeners.clear()
+
+
+class HandleReplica:
+    """Local copy of the user id -> Codeforces handle mapping.
+
+    Loaded once when first used and kept current by the backend, so lookups are
+    dictionary reads. Lookups before the first snapshot arrives wait for it, up
+    to `load_timeout` seconds after the start, and then read the backend directly.
+    """
+
+    def __init__(self, backend, load_timeout: float = 30):
+        self.backend = backend
+        self.load_timeout = load_timeout
+        self.handles: dict[str, str] = {}
+        self.lock = threading.Lock()
+        self.loaded = threading.Event()
+        self.started_at: Optional[float] = None
+
+    def _start(self) -> None:
+        with self.lock:
+            if self.started_at is not None:
+                return
+            self.started_at = time.monotonic()
+        self.backend.watch(self._apply)
+
+    def _apply(self, changes: dict[str, Optional[str]]) -> None:
+        with self.lock:
+            for user_id, handle in changes.items():
+                if handle is None:
+                    self.handles.pop(user_id, None)
+                else:
+                    self.handles[user_id] = handle
+        self.loaded.set()
+
+    def _wait(self) -> bool:
+        """Whether the replica is loaded, waiting for what is left of the load timeout."""
+        if not self.loaded.is_set():
+            self._start()
+            if not self.loaded.wait(max(0.0, self.started_at + self.load_timeout - time.monotonic())):
+                logger.warning("Handle replica is not loaded yet, reading the backend directly")
+                return False
+        return True
+
+    def get_handle(self, user_id: int) -> Optional[str]:
+        if not self._wait():
+            return self.backend.read_handle(str(user_id))
+        return self.handles.get(str(user_id))
+
+    def get_handles(self) -> list[str]:
+        if not self._wait():
+            return list(self.backend.read().values())
+        with self.lock:
+            return list(self.handles.values())
+
+    def get_owners(self, handle: str) -> list[str]:
+        """Ids of the users who registered `handle`."""
+        if not self._wait():
+            return self.backend.read_owners(handle)
+        with self.lock:
+            return [user_id for user_id, h in self.handles.items() if h == handle]
+
+    def close(self) -> None:
+        self.backend.close()
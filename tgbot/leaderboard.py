@@ -0,0 +1,90 @@
+import bisect
+import logging
+import threading
+import time
+from typing import Any, Optional, Union
+
+from prettytable import PrettyTable
+
+from tgbot.codeforces import User
+
+logger = logging.getLogger(__name__)
+
+Row = tuple[str, Union[int, str], str]
+
+
+def leaderboard_row(user: User) -> Row:
+    if user.rating is not None:
+        return user.handle, user.rating, user.rank
+    return user.handle, "-", "-"
+
+
+def sort_key(row: Row) -> tuple[int, str]:
+    return -row[1] if isinstance(row[1], int) else 69420, row[0]
+
+
+class Leaderboard:
+    """The /explode table, rendered again only when a handle or rating changes.
+
+    Rows are kept sorted; a change re-sorts only the rows of the affected
+    members. The rendered text is cached under a version derived from the rows.
+    """
+
+    def __init__(self):
+        self.rows: dict[str, Row] = {}
+        self.sorted_keys: list[tuple[int, str]] = []
+        self.version: Optional[int] = None
+        self.text = ""
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.last_render = 0.0
+        self.total_render = 0.0
+
+    def render(self, users: list[User]) -> str:
+        rows = {u.handle: leaderboard_row(u) for u in users}
+        version = hash(frozenset(rows.items()))
+        with self.lock:
+            if version == self.version:
+                self.hits += 1
+                return self.text
+
+            start = time.perf_counter()
+            self._update(rows)
+            self.text = self._render()
+            self.version = version
+            self.misses += 1
+            self.last_render = time.perf_counter() - start
+            self.total_render += self.last_render
+            logger.info(f"Rendered leaderboard in {self.last_render * 1000:.1f} ms, "
+                        f"hit rate {self.hits / (self.hits + self.misses):.0%}")
+            return self.text
+
+    def _update(self, rows: dict[str, Row]) -> None:
+        for handle, row in self.rows.items():
+            if rows.get(handle) != row:
+                del self.sorted_keys[bisect.bisect_left(self.sorted_keys, sort_key(row))]
+        for handle, row in rows.items():
+            if self.rows.get(handle) != row:
+                bisect.insort(self.sorted_keys, sort_key(row))
+        self.rows = rows
+
+    def _render(self) -> str:
+        table = PrettyTable(["Handle", "Rating", "Title"])
+        table.header_align = "c"
+        table.align["Handle"] = "l"
+        table.align["Rating"] = "r"
+        table.align["Title"] = "l"
+        table.add_rows([self.rows[handle] for _, handle in self.sorted_keys])
+        return f"<pre>{table}</pre>"
+
+    def stats(self) -> dict[str, Any]:
+        renders = max(self.misses, 1)
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / max(self.hits + self.misses, 1),
+            "last_render_ms": self.last_render * 1000,
+            "avg_render_ms": self.total_render / renders * 1000
+        }
@@ -0,0 +1,190 @@
+import asyncio
+import contextlib
+import math
+import threading
+import time
+from typing import Any, AsyncIterator, Iterable, Iterator, NamedTuple
+
+# Prometheus text exposition format, https://prometheus.io/docs/instrumenting/exposition_formats/
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Sample(NamedTuple):
+    name: str
+    labels: dict[str, str]
+    value: float
+
+
+class Family(NamedTuple):
+    name: str
+    type: str
+    help: str
+    samples: list[Sample]
+
+
+def gauge(name: str, help: str, samples: Iterable[tuple[dict[str, str], float]]) -> Family:
+    return Family(name, "gauge", help, [Sample(name, labels, value) for labels, value in samples])
+
+
+def stats_gauges(prefix: str, label: str, stats: dict[str, dict[str, Any]], **labels: str) -> list[Family]:
+    """One gauge per numeric statistic: `{"users": {"hit_rate": 0.5}}` gives `<prefix>_hit_rate{<label>="users"}`."""
+    families: dict[str, Family] = {}
+    for key, values in stats.items():
+        for stat, value in values.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                name = f"{prefix}_{stat}"
+                help = f"{stat.replace('_', ' ').capitalize()} per {label}"
+                family = families.setdefault(name, gauge(name, help, []))
+                family.samples.append(Sample(name, {**labels, label: key}, value))
+    return list(families.values())
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.values: dict[tuple[str, ...], float] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *labelvalues: str, amount: float = 1) -> None:
+        with self.lock:
+            self.values[labelvalues] = self.values.get(labelvalues, 0) + amount
+
+    def collect(self) -> Family:
+        with self.lock:
+            values = list(self.values.items())
+        return Family(self.name, "counter", self.help, [
+            Sample(self.name, dict(zip(self.labelnames, key)), value) for key, value in values
+        ])
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self.counts: dict[tuple[str, ...], list[int]] = {}  # per bucket, not cumulative; the last one is +Inf
+        self.sums: dict[tuple[str, ...], float] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        i = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self.lock:
+            counts = self.counts.setdefault(labelvalues, [0] * (len(self.buckets) + 1))
+            counts[i] += 1
+            self.sums[labelvalues] = self.sums.get(labelvalues, 0) + value
+
+    @contextlib.contextmanager
+    def time(self, *labelvalues: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labelvalues)
+
+    def collect(self) -> Family:
+        with self.lock:
+            counts = {key: list(c) for key, c in self.counts.items()}
+            sums = dict(self.sums)
+
+        samples = []
+        for key, c in counts.items():
+            labels = dict(zip(self.labelnames, key))
+            total = 0
+            for bound, count in zip(self.buckets + (math.inf,), c):
+                total += count
+                samples.append(Sample(f"{self.name}_bucket", {**labels, "le": format_value(bound)}, total))
+            samples.append(Sample(f"{self.name}_sum", labels, sums[key]))
+            samples.append(Sample(f"{self.name}_count", labels, total))
+        return Family(self.name, "histogram", self.help, samples)
+
+
+def format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render(families: Iterable[Family]) -> str:
+    lines = []
+    for family in families:
+        lines.append(f"# HELP {family.name} {family.help}")
+        lines.append(f"# TYPE {family.name} {family.type}")
+        for sample in family.samples:
+            labels = ",".join(f'{k}="{escape(str(v))}"' for k, v in sample.labels.items())
+            lines.append(f"{sample.name}{{{labels}}} {format_value(sample.value)}" if labels
+                         else f"{sample.name} {format_value(sample.value)}")
+    return "\n".join(lines) + "\n"
+
+
+# Shared by the bot and cf_update; each process exposes its own
+upstream_seconds = Histogram(
+    "tgbot_upstream_request_seconds", "Latency of requests to Codeforces, Clist and Telegram", ("upstream", "endpoint")
+)
+upstream_errors = Counter(
+    "tgbot_upstream_errors_total", "Failed requests to Codeforces, Clist and Telegram",
+    ("upstream", "endpoint", "error")
+)
+command_seconds = Histogram("tgbot_command_seconds", "Time to handle a bot command", ("command",))
+lock_wait_seconds = Histogram("tgbot_lock_wait_seconds", "Time spent waiting to acquire a lock", ("lock",))
+
+
+@contextlib.contextmanager
+def track(upstream: str, endpoint: str) -> Iterator[None]:
+    """Record the latency of a request, and its error if it fails."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        upstream_errors.inc(upstream, endpoint, type(e).__name__)
+        raise
+    finally:
+        upstream_seconds.observe(time.perf_counter() - start, upstream, endpoint)
+
+
+@contextlib.asynccontextmanager
+async def waited(lock: asyncio.Lock, name: str) -> AsyncIterator[None]:
+    """`async with lock`, recording the time spent waiting for it."""
+    start = time.perf_counter()
+    async with lock:
+        lock_wait_seconds.observe(time.perf_counter() - start, name)
+        yield
+
+
+def client_gauges(**clients: Any) -> list[Family]:
+    """Cache, coalescing and circuit breaker statistics of Codeforces and Clist clients, labelled by keyword."""
+    families = []
+    for name, client in clients.items():
+        if hasattr(client, "cache_stats"):
+            families += stats_gauges("tgbot_cache", "cache", client.cache_stats(), client=name)
+        if hasattr(client, "request_stats"):
+            families += stats_gauges("tgbot_single_flight", "endpoint", client.request_stats(), client=name)
+        breaker = client.resilience.breaker
+        families += stats_gauges("tgbot_circuit", "upstream", {
+            breaker.name: {**client.resilience.stats(), "open": int(breaker.state != "CLOSED")}
+        }, client=name)
+    return merge(families)
+
+
+def merge(families: Iterable[Family]) -> list[Family]:
+    """Combine families of the same name, which a scrape must list only once."""
+    merged: dict[str, Family] = {}
+    for family in families:
+        if family.name in merged:
+            merged[family.name].samples.extend(family.samples)
+        else:
+            merged[family.name] = Family(family.name, family.type, family.help, list(family.samples))
+    return list(merged.values())
+
+
+def shared_families() -> list[Family]:
+    return [m.collect() for m in (upstream_seconds, upstream_errors, command_seconds, lock_wait_seconds)]
@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from enum import Enum
+from typing import Any, Awaitable, Callable, Iterator
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitState(str, Enum):
+    CLOSED = "CLOSED"
+    OPEN = "OPEN"
+    HALF_OPEN = "HALF_OPEN"
+
+
+class CircuitBreaker:
+    """Stop calling an upstream after `threshold` consecutive failures.
+
+    Calls are refused for `reset_timeout` seconds, after which a single probe is
+    let through. The circuit closes if the probe succeeds and opens again otherwise.
+    """
+
+    def __init__(self, name: str, threshold: int = 5, reset_timeout: float = 30):
+        self.name = name
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+
+        self.state = CircuitState.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.lock = threading.Lock()
+
+        self.opened = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.state == CircuitState.CLOSED:
+                return True
+            now = time.monotonic()
+            if now - self.opened_at >= self.reset_timeout:
+                # This caller is the probe. Another one is let through if it does not report back in time.
+                self.state = CircuitState.HALF_OPEN
+                self.opened_at = now
+                return True
+            self.rejected += 1
+            return False
+
+    def retry_after(self) -> float:
+        """Seconds until a call may be let through, 0 if calls are let through now."""
+        with self.lock:
+            if self.state == CircuitState.CLOSED:
+                return 0
+            return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def record_success(self) -> None:
+        with self.lock:
+            if self.state != CircuitState.CLOSED:
+                logger.info(f"Circuit {self.name} closed")
+            self.state = CircuitState.CLOSED
+            self.failures = 0
+
+    def record_failure(self) -> None:
+        with self.lock:
+            self.failures += 1
+            if self.state == CircuitState.HALF_OPEN or (
+                    self.state == CircuitState.CLOSED and self.failures >= self.threshold
+            ):
+                self.state = CircuitState.OPEN
+                self.opened_at = time.monotonic()
+                self.opened += 1
+                logger.warning(f"Circuit {self.name} opened for {self.reset_timeout} s "
+                               f"after {self.failures} consecutive failures")
+
+    def stats(self) -> dict[str, Any]:
+        with self.lock:
+            return {
+                "state": self.state.value,
+                "consecutive_failures": self.failures,
+                "opened": self.opened,
+                "rejected": self.rejected
+            }
+
+
+class RetryPolicy:
+    """Up to `attempts` tries with full-jitter exponential backoff between them."""
+
+    def __init__(self, attempts: int = 3, base_delay: float = 0.5, max_delay: float = 8):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delays(self) -> Iterator[float]:
+        """Delays before each retry."""
+        for attempt in range(self.attempts - 1):
+            yield random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class Resilience:
+    """Retries and a circuit breaker around idempotent requests to one upstream.
+
+    Only exceptions of the `transient` types are retried and count as failures;
+    any other exception means that the upstream answered. When the circuit is
+    open or retries are exhausted, an `unavailable` error is raised.
+    """
+
+    def __init__(
+            self,
+            breaker: CircuitBreaker,
+            policy: RetryPolicy,
+            transient: tuple[type[BaseException], ...],
+            unavailable: type[Exception]
+    ):
+        self.breaker = breaker
+        self.policy = policy
+        self.transient = transient
+        self.unavailable = unavailable
+        self.retries = 0
+
+    def _failed(self, e: BaseException, delay: float) -> bool:
+        """Record a failed attempt. Returns whether to try again after `delay` seconds."""
+        self.breaker.record_failure()
+        logger.warning(f"{self.breaker.name} request failed: {type(e).__name__}: {e!s}")
+        if delay < 0 or self.breaker.retry_after() > 0:
+            return False
+        self.retries += 1
+        return True
+
+    def call(self, fetch: Callable[[], Any]) -> Any:
+        delays = self.policy.delays()
+        while self.breaker.allow():
+            try:
+                result = fetch()
+            except self.transient as e:
+                if not self._failed(e, delay := next(delays, -1)):
+                    if isinstance(e, self.unavailable):
+                        raise
+                    raise self.unavailable() from e
+                time.sleep(delay)
+            except Exception:
+                self.breaker.record_success()
+                raise
+            else:
+                self.breaker.record_success()
+                return result
+        raise self.unavailable()
+
+    async def acall(self, fetch: Callable[[], Awaitable]) -> Any:
+        delays = self.policy.delays()
+        while self.breaker.allow():
+            try:
+                result = await fetch()
+            except self.transient as e:
+                if not self._failed(e, delay := next(delays, -1)):
+                    if isinstance(e, self.unavailable):
+                        raise
+                    raise self.unavailable() from e
+                await asyncio.sleep(delay)
+            except Exception:
+                self.breaker.record_success()
+                raise
+            else:
+                self.breaker.record_success()
+                return result
+        raise self.unavailable()
+
+    def stats(self) -> dict[str, Any]:
+        return {**self.breaker.stats(), "retries": self.retries}
@@ -0,0 +1,78 @@
+import asyncio
+import threading
+from collections import Counter
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+    """Share one call among concurrent callers with the same key.
+
+    Keys are tuples whose first element names the endpoint; coalesced calls are
+    counted per endpoint. Callers share the result object and must not mutate it.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls: dict[Hashable, "_Call"] = {}
+        self.tasks: dict[Hashable, asyncio.Task] = {}
+        self.started: Counter[str] = Counter()
+        self.coalesced: Counter[str] = Counter()
+
+    def do(self, key: tuple, fetch: Callable[[], Any]) -> Any:
+        with self.lock:
+            call = self.calls.get(key)
+            if call is None:
+                call = self.calls[key] = _Call()
+                self.started[key[0]] += 1
+                leader = True
+            else:
+                self.coalesced[key[0]] += 1
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fetch()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        return call.result
+
+    async def ado(self, key: tuple, fetch: Callable[[], Awaitable]) -> Any:
+        task = self.tasks.get(key)
+        if task is None:
+            # A task, so that cancelling one caller does not fail the others
+            task = self.tasks[key] = asyncio.create_task(fetch())
+            task.add_done_callback(lambda t: self._finish(key, t))
+            self.started[key[0]] += 1
+        else:
+            self.coalesced[key[0]] += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        self.tasks.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # retrieved, even if every caller was cancelled
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        return {
+            endpoint: {"requests": self.started[endpoint], "coalesced": self.coalesced[endpoint]}
+            for endpoint in self.started
+        }
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
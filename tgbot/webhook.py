@@ -0,0 +1,142 @@
+import asyncio
+import contextlib
+import logging
+import os
+import tempfile
+import traceback
+from datetime import datetime
+from typing import Any, Optional
+
+from aiohttp import ClientSession, ClientTimeout, web
+
+from tgbot.clist import AsyncClistAPI
+from tgbot.clist.models import ContestInfo
+from tgbot.codeforces import AsyncCodeforcesAPI, CodeforcesAPI, ProblemIndex, ProblemsetSnapshot, User
+from tgbot.config import config
+from tgbot.digester import arun, digest
+from tgbot.gcp_common import (
+    enable_debugger, get_handle, get_handle_owners, get_handles, get_task_client,
+    schedule_task, set_commands, set_verification, setup_cloud_logging, warm_up
+)
+from tgbot.leaderboard import Leaderboard
+from tgbot.metrics import CONTENT_TYPE, client_gauges, merge, render, shared_families, stats_gauges
+
+logger = logging.getLogger(__name__)
+
+routes = web.RouteTableDef()
+
+
+class AsyncMessageDigester:
+    """Async I/O for `tgbot.digester.digest`.
+
+    Codeforces and Clist are called through the async clients. Firestore and
+    Cloud Tasks only have blocking clients here, so they run in worker threads.
+    """
+
+    def __init__(self, app: web.Application, data: dict[str, Any]):
+        self.app = app
+        self.data = data
+
+    async def digest(self) -> Optional[dict[str, Any]]:
+        return await arun(digest(self.data), self)
+
+    async def get_handle(self, user_id: int) -> Optional[str]:
+        return await asyncio.to_thread(get_handle, user_id)
+
+    async def get_handle_owners(self, handle: str) -> list[str]:
+        return await asyncio.to_thread(get_handle_owners, handle)
+
+    async def get_handles(self) -> list[str]:
+        return await asyncio.to_thread(get_handles)
+
+    async def get_user(self, handle: str) -> User:
+        return await self.app["cf_client"].get_user(handle)
+
+    async def get_users(self, handles: list[str]) -> list[User]:
+        return await self.app["cf_client"].get_users(*handles)
+
+    async def get_problem_index(self) -> ProblemIndex:
+        # Served from memory unless the problemset was never loaded
+        return await asyncio.to_thread(self.app["problemset_client"].get_problem_index)
+
+    async def get_upcoming_contests(self) -> list[ContestInfo]:
+        return await self.app["clist_client"].get_upcoming_contests()
+
+    async def render_leaderboard(self, users: list[User]) -> str:
+        return self.app["leaderboard"].render(users)
+
+    async def set_verification(self, user_id: int, data: dict[str, Any]) -> None:
+        await asyncio.to_thread(set_verification, user_id, data)
+
+    async def schedule_task(self, endpoint: str, data: dict[str, Any], dt: datetime) -> None:
+        await asyncio.to_thread(schedule_task, endpoint, data, dt)
+
+    async def request_delta(self, chat_id: int) -> None:
+        async with self.app["session"].post(
+                f"{config['CF_UPDATE_URL']}/delta",
+                json={"chat_id": chat_id},
+                headers={"X-Auth-Token": config["SECRET"]},
+                timeout=ClientTimeout(total=5)
+        ) as resp:
+            if resp.status != 200:
+                logger.warning(f"cf_update /delta returned {resp.status}")
+
+
+@routes.post("/")
+async def hello(request: web.Request) -> web.Response:
+    try:
+        data = await request.json()
+        logger.info(data)
+        response = await AsyncMessageDigester(request.app, data).digest()
+        logger.info(response)
+        if response:
+            return web.json_response(response)
+    except Exception as e:
+        logger.error(''.join(traceback.format_exception(type(e), e, e.__traceback__)))
+    return web.Response(text="")
+
+
+@routes.get("/metrics")
+async def metrics(request: web.Request) -> web.Response:
+    if request.headers.get("X-Auth-Token") != config["SECRET"]:
+        logger.warning("Endpoint /metrics was accessed without authentication")
+        return web.json_response({"success": False, "reason": "Authentication failed"})
+
+    app = request.app
+    families = shared_families() + merge(
+        client_gauges(
+            cf_client=app["cf_client"], clist_client=app["clist_client"], problemset_client=app["problemset_client"]
+        )
+        + stats_gauges("tgbot_cache", "cache", {"leaderboard": app["leaderboard"].stats()}, client="webhook")
+    )
+    return web.Response(body=render(families).encode(), headers={"Content-Type": CONTENT_TYPE})
+
+
+async def startup(app: web.Application) -> None:
+    context_stack = contextlib.AsyncExitStack()
+    app["context_stack"] = context_stack
+
+    app["cf_client"] = await context_stack.enter_async_context(AsyncCodeforcesAPI())
+    app["clist_client"] = await context_stack.enter_async_context(AsyncClistAPI(config["CLIST_API_KEY"]))
+    app["session"] = await context_stack.enter_async_context(ClientSession())
+    app["leaderboard"] = Leaderboard()
+
+    # The problemset is kept by the refresh-ahead cache of the sync client
+    app["problemset_client"] = CodeforcesAPI(ProblemsetSnapshot(
+        os.path.join(tempfile.gettempdir(), "problemset.json"),
+        fallback_path=os.path.join(os.path.dirname(__file__), "problemset.json")  # bundled at deploy time
+    ))
+
+    warm_up(set_commands, setup_cloud_logging, enable_debugger, get_task_client, get_handles)
+
+
+async def cleanup(app: web.Application) -> None:
+    await app["context_stack"].aclose()
+
+
+async def create_app() -> web.Application:
+    app = web.Application()
+    app.add_routes(routes)
+    app.on_startup.append(startup)
+    app.on_cleanup.append(cleanup)
+    return app